@@ -40,6 +40,16 @@ df_json_2.head()
 employees_df = pd.json_normalize(df_json_2['Employees'])
 employees_df.head()
 
+# %%
+# For big exports, read_json + json_normalize holds the whole file in memory twice (as dicts, then flattened).
+# json_stream decodes the "Employees" records one at a time and flattens them into DataFrames of batch_size rows,
+# which can go straight to a Parquet file, so memory depends on the batch size and not on the file
+from json_stream import iter_batches, json_to_parquet
+
+for employees_batch in iter_batches('employees_2.json', batch_size=2, record_path="Employees"):
+    print(employees_batch)
+json_to_parquet('employees_2.json', 'employees.parquet', record_path="Employees")
+
 # %%
 # Reading YAML Data 
 # Pandas doesn't have a method to read data from a YAML file. 
@@ -91,4 +101,26 @@ sample_dict = sample_df.to_dict()
 
 with open('sample.yaml', 'w') as f:
     yaml.dump(sample_dict, f)
+
+# %%
+# Each of the writes above serialises the whole frame in memory, and yaml.dump uses the pure Python dumper.
+# frame_writers.write_formats appends the frame chunk by chunk to CSV, JSON lines and YAML (a list of records,
+# written by the C dumper) in a single pass. A .gz suffix compresses the file with gzip (.zst with zstd,
+# if the zstandard package is installed)
+from frame_writers import write_formats
+
+write_formats(sample_df, csv_path='sample_stream.csv.gz', jsonl_path='sample_stream.jsonl.gz',
+              yaml_path='sample_stream.yaml.gz', chunksize=2)
+
 # %%
+# READING ANY FORMAT WITH ONE CALL
+# format_reader.read_any picks the reader from the file extension: pyarrow for CSV, orjson for JSON and the
+# C (libyaml) loader for YAML, whichever of them are installed. Nested records such as the "Employees" list
+# are flattened straight into columns (no json_normalize step), and a file read before is served from a cache
+# until it changes on disk
+from format_reader import read_any
+
+df_csv_any = read_any('Salaries.csv', index_col="Id")
+df_employees_any = read_any('employees_2.json', record_path="Employees")
+df_yaml_any = read_any('animals.yaml')
+df_employees_any.head()
@@ -13,6 +13,10 @@ np.nan + float("inf")
 # %%
 # Adding and Removing Columns
 import pandas as pd
+# This notebook reads the same URL several times. read_csv_cached (remote_cache.py) downloads and
+# parses it once and then serves it from a local cache, e.g.:
+# from remote_cache import read_csv_cached
+# sf_sal = read_csv_cached('https://aicore-files.s3.amazonaws.com/Foundations/Data_Formats/Salaries.csv', index_col='Id')
 # Read CSV and get salary dataset
 sf_sal = pd.read_csv('https://aicore-files.s3.amazonaws.com/Foundations/Data_Formats/Salaries.csv', index_col='Id')
 sf_sal
@@ -69,6 +73,15 @@ sf_sal = pd.concat((sf_sal, new_row), ignore_index=True)
 
 # Note that the old df.append() method is deprecated as of Pandas v2.0.
 
+# %%
+# pd.concat copies the whole dataframe every time, so adding many rows one by one gets slow.
+# AppendBuffer (append_buffer.py) collects the rows and builds the dataframe once
+from append_buffer import AppendBuffer
+
+buffer = AppendBuffer(sf_sal)
+buffer.append(new_row.iloc[0].to_dict())
+buffer.to_frame().tail()
+
 # %%
 # Read CSV and get salary dataset
 sf_sal = pd.read_csv('https://aicore-files.s3.amazonaws.com/Foundations/Data_Formats/Salaries.csv', index_col='Id')
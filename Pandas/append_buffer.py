@@ -0,0 +1,137 @@
+# %%
+# Buffered row appends for DataFrames.
+# advanced_dataframe_operations.py adds a row with pd.concat((sf_sal, new_row), ignore_index=True).
+# Every concat copies the whole frame, so appending rows one at a time is
+# quadratic in the number of rows. AppendBuffer collects incoming rows in one
+# Python list per column (list.append is amortised O(1)) and only builds a
+# DataFrame when it is flushed, either because enough rows have arrived or
+# because enough time has passed since the last flush.
+import time
+
+import numpy as np
+import pandas as pd
+
+
+class AppendBuffer:
+    """Collect rows (dicts of column -> value) and turn them into DataFrames in batches.
+
+    base is an optional DataFrame the rows are appended to. Each flush builds
+    one DataFrame from the buffered rows; if on_flush is given it is called with
+    that DataFrame (e.g. to write it somewhere), otherwise the batches are kept
+    and joined onto base by to_frame().
+    """
+
+    def __init__(self, base=None, columns=None, flush_rows=10_000, flush_seconds=None, on_flush=None):
+        self.base = base
+        if columns is None:
+            columns = list(base.columns) if base is not None else []
+        self._columns = {col: [] for col in columns}
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.on_flush = on_flush
+        self._size = 0
+        self._batches = []
+        self._last_flush = time.monotonic()
+
+    def __len__(self):
+        """Number of rows waiting to be flushed."""
+        return self._size
+
+    def append(self, row):
+        """Buffer one row. Missing columns become NaN; new columns are added after the others, in row order."""
+        for col in row:
+            if col not in self._columns:
+                self._columns[col] = [np.nan] * self._size
+        for col, values in self._columns.items():
+            values.append(row.get(col, np.nan))
+        self._size += 1
+
+        if self._size >= self.flush_rows or (
+            self.flush_seconds is not None and time.monotonic() - self._last_flush >= self.flush_seconds
+        ):
+            self.flush()
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def flush(self):
+        """Build a DataFrame from the buffered rows and empty the buffer.
+
+        Returns the new DataFrame (None if nothing was buffered).
+        """
+        self._last_flush = time.monotonic()
+        if self._size == 0:
+            return None
+        batch = pd.DataFrame(self._columns)
+        self._columns = {col: [] for col in self._columns}
+        self._size = 0
+        if self.on_flush is not None:
+            self.on_flush(batch)
+        else:
+            self._batches.append(batch)
+        return batch
+
+    def to_frame(self, ignore_index=True):
+        """Flush and return base with all the batches appended, using a single concat."""
+        self.flush()
+        frames = ([self.base] if self.base is not None else []) + self._batches
+        if not frames:
+            return pd.DataFrame(columns=list(self._columns))
+        self.base = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=ignore_index)
+        self._batches = []
+        return self.base
+
+
+def benchmark(base, n_rows=2_000, row=None):
+    """Time appending n_rows one at a time with pd.concat against AppendBuffer."""
+    if row is None:
+        row = base.iloc[0].to_dict()
+
+    df = base
+    tic = time.perf_counter()
+    for _ in range(n_rows):
+        df = pd.concat((df, pd.DataFrame([row])), ignore_index=True)
+    concat_time = time.perf_counter() - tic
+
+    tic = time.perf_counter()
+    buffer = AppendBuffer(base)
+    for _ in range(n_rows):
+        buffer.append(row)
+    buffered = buffer.to_frame()
+    buffer_time = time.perf_counter() - tic
+
+    assert buffered.shape == df.shape
+    print(f"{n_rows:,} appends onto {len(base):,} rows")
+    print(f"pd.concat per row: {concat_time:.3f}s ({1e6 * concat_time / n_rows:.0f} us/row)")
+    print(f"AppendBuffer:      {buffer_time:.3f}s ({1e6 * buffer_time / n_rows:.1f} us/row)")
+    return concat_time, buffer_time
+
+
+# %%
+if __name__ == "__main__":
+    sf_sal = pd.read_csv("data.csv")
+    buffer = AppendBuffer(sf_sal)
+    buffer.append({
+        'EmployeeName': 'JOHN DOE',
+        'JobTitle': 'MANAGER',
+        'BasePay': 100000.00,
+        'OvertimePay': 5000.00,
+        'OtherPay': 2500.00,
+        'TotalPay': 107500.00,
+        'TotalPayBenefits': 107500.00,
+        'Year': 2011,
+        'Agency': 'San Francisco',
+    })
+    print(buffer.to_frame().tail(3))
+
+    # Columns that first turn up in later rows come out in the order pd.concat gives them
+    rows = [{"b": 1, "a": 2}, {"z": 3, "a": 4, "m": 5}, {"y": 6, "b": 7, "c": 8, "x": 9}]
+    concat_df = pd.DataFrame({"a": [0], "b": [0]})
+    buffer = AppendBuffer(concat_df, flush_rows=2)
+    for row in rows:
+        concat_df = pd.concat((concat_df, pd.DataFrame([row])), ignore_index=True)
+        buffer.append(row)
+    pd.testing.assert_frame_equal(buffer.to_frame(), concat_df)
+
+    benchmark(sf_sal)
@@ -0,0 +1,169 @@
+# %%
+# The demo datasets converted once to Arrow IPC (Feather v2) and memory-mapped back.
+# Every script starts with pd.read_csv on the same text files - data.csv,
+# california_housing_train.csv, Beijing_PM.csv, Car_Insurance.csv - and
+# tokenises and parses them again on each run. convert_dataset reads a CSV
+# once (with the read_csv options the scripts use, e.g. index_col="Id") and
+# writes it uncompressed in the Arrow IPC file format, with the size and
+# modification time of the CSV in the file's metadata. The file is named
+# after the CSV and a hash of its full path and read options, so two
+# data.csv files in different folders get different Arrow files. load_dataset
+# memory-maps that file, so the column buffers are not read or copied up
+# front, and only converts the columns asked for to pandas; a CSV that has
+# changed since it was converted is converted again first.
+# Running this file converts all the datasets (or the ones named on the
+# command line): python arrow_datasets.py car_insurance salaries
+import hashlib
+import json
+import os
+import sys
+import warnings
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+HERE = Path(__file__).resolve().parent
+ARROW_DIR = Path(os.environ.get("DATASET_CACHE_DIR", Path.home() / ".cache" / "aicore_datasets")) / "arrow"
+
+# Dataset name -> (CSV path, read_csv options used by the scripts)
+DATASETS = {
+    "salaries": (HERE / "data.csv", {"index_col": "Id"}),
+    "california_housing": (HERE.parent / "SQL" / "sample_data" / "california_housing_train.csv", {}),
+    "beijing_pm": (HERE / "Beijing_PM.csv", {"index_col": "Date", "parse_dates": True}),
+    "car_insurance": (HERE / "Car_Insurance.csv", {"index_col": "Id"}),
+}
+
+
+def convert_dataset(name, arrow_dir=ARROW_DIR, force=False):
+    """Convert a dataset (a name in DATASETS, or a CSV path) to an Arrow IPC file; returns its path.
+
+    Nothing is done if the file is already there and up to date, unless force=True.
+    """
+    csv_path, read_csv_kwargs = _source(name)
+    arrow_path = _arrow_path(csv_path, read_csv_kwargs, arrow_dir)
+    if not force and _is_current(arrow_path, csv_path):
+        return arrow_path
+
+    df = pd.read_csv(csv_path, **read_csv_kwargs)
+    table = pa.Table.from_pandas(df)
+    stat = csv_path.stat()
+    source = {"path": str(csv_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    table = table.replace_schema_metadata({**table.schema.metadata, b"source": json.dumps(source).encode()})
+
+    arrow_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = arrow_path.with_suffix(".arrow.tmp")
+    # Uncompressed, so the file can be memory-mapped and used without decoding
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, arrow_path)
+    return arrow_path
+
+
+def load_dataset(name, columns=None, arrow_dir=ARROW_DIR, arrow_dtypes=False):
+    """Load a dataset from its memory-mapped Arrow file, converting the CSV first if needed.
+
+    columns limits the columns converted to pandas (the index is always
+    included). With arrow_dtypes=True the columns stay in Arrow memory
+    (pd.ArrowDtype) instead of being converted to NumPy dtypes, so nothing
+    is copied at all.
+    """
+    arrow_path = convert_dataset(name, arrow_dir)
+    with pa.memory_map(str(arrow_path)) as source:
+        table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        index_columns = [col for col in _pandas_metadata(table).get("index_columns", []) if isinstance(col, str)]
+        table = table.select(list(columns) + [col for col in index_columns if col not in columns])
+    return table.to_pandas(split_blocks=True, types_mapper=pd.ArrowDtype if arrow_dtypes else None)
+
+
+def convert_all(names=None, arrow_dir=ARROW_DIR, force=False):
+    """Convert the named datasets (all of DATASETS by default); returns name -> Arrow path.
+
+    Datasets whose CSV isn't there are skipped with a warning.
+    """
+    converted = {}
+    for name in names or DATASETS:
+        csv_path = _source(name)[0]
+        if not csv_path.exists():
+            warnings.warn(f"{name}: {csv_path} not found, skipped")
+            continue
+        converted[name] = convert_dataset(name, arrow_dir, force)
+    return converted
+
+
+def _source(name):
+    if name in DATASETS:
+        csv_path, read_csv_kwargs = DATASETS[name]
+        return Path(csv_path), read_csv_kwargs
+    return Path(name).resolve(), {}
+
+
+def _arrow_path(csv_path, read_csv_kwargs, arrow_dir):
+    # The stem alone would give a/data.csv, b/data.csv and data.tsv the same file
+    key = json.dumps([str(csv_path.resolve()), read_csv_kwargs], sort_keys=True, default=str)
+    return Path(arrow_dir) / f"{csv_path.stem}-{hashlib.sha1(key.encode()).hexdigest()[:12]}.arrow"
+
+
+def _is_current(arrow_path, csv_path):
+    if not arrow_path.exists():
+        return False
+    try:
+        with pa.memory_map(str(arrow_path)) as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+    except pa.ArrowInvalid:
+        return False
+    if b"source" not in metadata:
+        return False
+    source = json.loads(metadata[b"source"])
+    stat = csv_path.stat()
+    return source["path"] == str(csv_path) and source["size"] == stat.st_size and source["mtime_ns"] == stat.st_mtime_ns
+
+
+def _pandas_metadata(table):
+    metadata = table.schema.metadata or {}
+    return json.loads(metadata[b"pandas"]) if b"pandas" in metadata else {}
+
+
+# %%
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    for name, arrow_path in convert_all(sys.argv[1:] or None).items():
+        csv_path, read_csv_kwargs = DATASETS.get(name, (name, {}))
+        tic = time.perf_counter()
+        csv_df = pd.read_csv(csv_path, **read_csv_kwargs)
+        csv_time = time.perf_counter() - tic
+        tic = time.perf_counter()
+        arrow_df = load_dataset(name)
+        arrow_time = time.perf_counter() - tic
+        pd.testing.assert_frame_equal(arrow_df, csv_df)
+        print(f"{name:<20} read_csv {csv_time * 1000:7.1f} ms, load_dataset {arrow_time * 1000:6.1f} ms ({arrow_path})")
+
+    # CSV files with the same name in different folders are kept apart
+    with tempfile.TemporaryDirectory() as tmp:
+        for folder, values in [("a", [1, 2]), ("b", [3, 4, 5])]:
+            (Path(tmp) / folder).mkdir()
+            pd.DataFrame({"x": values}).to_csv(Path(tmp) / folder / "data.csv", index=False)
+        a_csv, b_csv = str(Path(tmp) / "a" / "data.csv"), str(Path(tmp) / "b" / "data.csv")
+        assert convert_dataset(a_csv, tmp) != convert_dataset(b_csv, tmp)
+        assert load_dataset(a_csv, arrow_dir=tmp)["x"].tolist() == [1, 2]
+        assert load_dataset(b_csv, arrow_dir=tmp)["x"].tolist() == [3, 4, 5]
+
+    # The housing data repeated to 1.7M rows
+    with tempfile.TemporaryDirectory() as tmp:
+        big_csv = Path(tmp) / "california_housing_big.csv"
+        pd.concat([pd.read_csv(DATASETS["california_housing"][0])] * 100).to_csv(big_csv, index=False)
+        tic = time.perf_counter()
+        pd.read_csv(big_csv)
+        csv_time = time.perf_counter() - tic
+        convert_dataset(str(big_csv), arrow_dir=tmp)
+        tic = time.perf_counter()
+        housing_df = load_dataset(str(big_csv), arrow_dir=tmp)
+        arrow_time = time.perf_counter() - tic
+        tic = time.perf_counter()
+        load_dataset(str(big_csv), columns=["median_income", "median_house_value"], arrow_dir=tmp)
+        subset_time = time.perf_counter() - tic
+        print(f"{len(housing_df):,} rows: read_csv {csv_time:.2f}s, load_dataset {arrow_time * 1000:.1f} ms, "
+              f"two columns {subset_time * 1000:.1f} ms")
@@ -0,0 +1,174 @@
+# %%
+# Binning continuous columns into categories, for batch and streaming data.
+# data_cleaning.py classifies flights as short / medium / long haul with
+# pd.cut(flights['Distance'], bins=bin_edges, labels=bin_labels, right=False).
+# Binner keeps the edges as a NumPy array and finds the bin of every value with
+# np.searchsorted, returning a category column directly from the codes (int8
+# when there are few bins). QuantileBinner gets its edges from quantiles, which
+# are estimated with a small mergeable sketch that is updated batch by batch,
+# so the quantiles never have to be recomputed over the whole dataset.
+import numpy as np
+import pandas as pd
+
+
+class Binner:
+    """Fixed-edge binning, equivalent to pd.cut(values, bins=edges, labels=labels, right=right).
+
+    Values outside the edges (and missing values) get no category (NaN).
+    """
+
+    def __init__(self, edges, labels=None, right=True):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        if np.any(np.diff(self.edges) <= 0):
+            raise ValueError("Bin edges must be strictly increasing")
+        n_bins = len(self.edges) - 1
+        if labels is None:
+            labels = pd.IntervalIndex.from_breaks(np.asarray(edges), closed="right" if right else "left")
+        if len(labels) != n_bins:
+            raise ValueError(f"Expected {n_bins} labels for {len(self.edges)} edges, got {len(labels)}")
+        self.labels = labels
+        self.right = right
+        self.code_dtype = np.int8 if n_bins < 127 else np.int16 if n_bins < 32_767 else np.int32
+
+    def codes(self, values):
+        """Bin number of each value (-1 outside the edges or missing)."""
+        values = np.asarray(values, dtype=np.float64)
+        # right=False: bins are [a, b), so count the edges <= value; right=True: (a, b], edges < value
+        codes = np.searchsorted(self.edges, values, side="left" if self.right else "right") - 1
+        outside = (codes < 0) | (codes >= len(self.edges) - 1) | np.isnan(values)
+        return np.where(outside, -1, codes).astype(self.code_dtype)
+
+    def transform(self, values):
+        """Return a category Series (same index as values if it is a Series)."""
+        categorical = pd.Categorical.from_codes(self.codes(values), categories=self.labels, ordered=True)
+        if isinstance(values, pd.Series):
+            return pd.Series(categorical, index=values.index, name=values.name)
+        return pd.Series(categorical)
+
+
+class QuantileSketch:
+    """Mergeable approximate quantiles of a stream (a simplified KLL sketch).
+
+    Values are added in batches. Each level holds at most k values; when a level
+    is full it is sorted and every other value moves up a level, where it counts
+    double. Memory stays around k * log2(n / k) values however long the stream is.
+    """
+
+    def __init__(self, k=2048, seed=0):
+        self.k = k
+        self.levels = []
+        self.count = 0
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        self.count += len(values)
+        self._add(0, values)
+        return self
+
+    def merge(self, other):
+        for level, values in enumerate(other.levels):
+            self._add(level, values)
+        self.count += other.count
+        return self
+
+    def quantile(self, q):
+        """Estimated quantile(s) q in [0, 1]."""
+        if not self.levels or self.count == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(v), 2.0 ** level) for level, v in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        values, cumulative = values[order], np.cumsum(weights[order])
+        positions = np.asarray(q) * cumulative[-1]
+        return values[np.minimum(np.searchsorted(cumulative, positions, side="left"), len(values) - 1)]
+
+    def _add(self, level, values):
+        while len(values):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            merged = np.concatenate([self.levels[level], values])
+            if len(merged) <= self.k:
+                self.levels[level] = merged
+                return
+            # Compact: sort, send every other value up a level (where it counts double), keep any odd one out
+            merged.sort()
+            n_compact = len(merged) - len(merged) % 2
+            offset = self._rng.integers(0, 2)
+            self.levels[level] = merged[n_compact:]
+            values = merged[offset:n_compact:2]
+            level += 1
+
+
+class QuantileBinner:
+    """Binning with quantile edges (like pd.qcut) that can be fitted batch by batch.
+
+    Call partial_fit with each batch of data; the edges are re-estimated from
+    the sketch the next time transform is called. The outer bins are open
+    ended, so every non-missing value falls in a bin.
+    """
+
+    def __init__(self, n_bins=4, labels=None, sketch=None):
+        self.n_bins = n_bins
+        self.labels = labels if labels is not None else [f"q{i + 1}" for i in range(n_bins)]
+        self.sketch = sketch or QuantileSketch()
+        self._binner = None
+
+    def partial_fit(self, values):
+        self.sketch.update(values)
+        self._binner = None
+        return self
+
+    @property
+    def edges(self):
+        inner = np.atleast_1d(self.sketch.quantile(np.arange(1, self.n_bins) / self.n_bins))
+        # Tied quantiles (e.g. lots of zeros) are nudged apart so the edges stay strictly increasing
+        for i in range(1, len(inner)):
+            inner[i] = max(inner[i], np.nextafter(inner[i - 1], np.inf))
+        return np.concatenate([[-np.inf], inner, [np.inf]])
+
+    def transform(self, values):
+        if self._binner is None:
+            self._binner = Binner(self.edges, self.labels, right=False)
+        return self._binner.transform(values)
+
+
+def bin_columns(df, binners, suffix="_bin"):
+    """Add a binned category column for every column -> Binner/QuantileBinner in binners."""
+    for col, binner in binners.items():
+        df[f"{col}{suffix}"] = binner.transform(df[col])
+    return df
+
+
+# %%
+if __name__ == "__main__":
+    import time
+
+    flights = pd.DataFrame({
+        'Route': ['NYC-LON', 'LON-PAR', 'NYC-TOK', 'LON-SYD', 'PAR-BER'],
+        'Distance': [3461, 214, 6749, 10562, 546]
+    })
+    haul = Binner([0, 1500, 4000, 12000], ['short haul', 'medium haul', 'long haul'], right=False)
+    flights['Flight Type'] = haul.transform(flights['Distance'])
+    print(flights)
+
+    # Same result as pd.cut on a big column, and the timings
+    rng = np.random.default_rng(0)
+    distances = pd.Series(rng.uniform(0, 13000, 10_000_000))
+    tic = time.perf_counter()
+    expected = pd.cut(distances, bins=[0, 1500, 4000, 12000], labels=haul.labels, right=False)
+    cut_time = time.perf_counter() - tic
+    tic = time.perf_counter()
+    result = haul.transform(distances)
+    binner_time = time.perf_counter() - tic
+    assert result.equals(expected)
+    print(f"pd.cut: {cut_time:.3f}s, Binner: {binner_time:.3f}s")
+
+    # Quartiles of a stream, fitted one batch at a time
+    quartiles = QuantileBinner(4)
+    for batch in np.array_split(distances.to_numpy(), 100):
+        quartiles.partial_fit(batch)
+    print("Estimated quartile edges:", quartiles.edges[1:-1].round(1))
+    print("Exact quartile edges:    ", np.quantile(distances, [0.25, 0.5, 0.75]).round(1))
+    print(quartiles.transform(distances).value_counts(sort=False))
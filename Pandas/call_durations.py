@@ -0,0 +1,163 @@
+# %%
+# Vectorised call durations for the Car_Insurance call logs.
+# car_insurance_calls.py works out the length of each call with a row-wise
+# df.apply(...) over datetime.time objects. That is fine for a handful of rows,
+# but on millions of rows the per-row Python objects dominate the run time.
+# Here "HH:MM:SS" strings are parsed once into int32 seconds-of-day arrays,
+# and everything else (durations, mean, percentiles, formatting) is plain NumPy.
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+SECONDS_PER_DAY = 24 * 60 * 60
+# Value used for missing or malformed times/durations in the int32 arrays
+MISSING = -1
+
+
+def parse_hms(values):
+    """Parse "HH:MM:SS" strings into int32 seconds since midnight.
+
+    Missing or malformed values come back as MISSING (-1).
+    """
+    values = np.asarray(values, dtype=object)
+    missing = pd.isna(values)
+    # Fixed-width unicode lets us treat the strings as an (n, 9) grid of code points; the 9th is
+    # only non-zero for strings that are too long, so "12:34:56xyz" isn't cut down to a valid time
+    raw = np.where(missing, "", values).astype("U9")
+    chars = raw.view(np.uint32).reshape(-1, 9).astype(np.int64)
+    digits = chars - ord("0")
+
+    hours = digits[:, 0] * 10 + digits[:, 1]
+    minutes = digits[:, 3] * 10 + digits[:, 4]
+    seconds = digits[:, 6] * 10 + digits[:, 7]
+
+    digit_cols = digits[:, [0, 1, 3, 4, 6, 7]]
+    valid = (
+        ~missing
+        & (chars[:, 8] == 0)
+        & np.all((digit_cols >= 0) & (digit_cols <= 9), axis=1)
+        & (chars[:, 2] == ord(":"))
+        & (chars[:, 5] == ord(":"))
+        & (hours < 24)
+        & (minutes < 60)
+        & (seconds < 60)
+    )
+    total = hours * 3600 + minutes * 60 + seconds
+    return np.where(valid, total, MISSING).astype(np.int32)
+
+
+def call_durations(start, end):
+    """Return the duration of each call in seconds as an int32 array.
+
+    start and end can be "HH:MM:SS" strings or arrays already returned by parse_hms.
+    Calls that cross midnight (end earlier than start) wrap around to the next day.
+    """
+    start = _as_seconds(start)
+    end = _as_seconds(end)
+    durations = (end - start) % SECONDS_PER_DAY
+    return np.where((start == MISSING) | (end == MISSING), MISSING, durations).astype(np.int32)
+
+
+def mean_duration(durations):
+    """Mean of the non-missing durations in seconds (NaN if there are none)."""
+    valid = _valid(durations)
+    if valid.size == 0:
+        return np.nan
+    return valid.mean()
+
+
+def percentile_duration(durations, q):
+    """Percentile(s) q (0-100) of the non-missing durations in seconds."""
+    valid = _valid(durations)
+    if valid.size == 0:
+        return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+    return np.percentile(valid, q)
+
+
+def format_hms(seconds):
+    """Format seconds as "HH:MM:SS" strings.
+
+    Accepts a scalar or an array. Values are rounded to the nearest second, and
+    missing values (MISSING or NaN) become empty strings. Hours are not wrapped,
+    so values over 99 hours are clipped to 99:59:59.
+    """
+    scalar = np.ndim(seconds) == 0
+    seconds = np.atleast_1d(np.asarray(seconds, dtype=np.float64))
+    missing = np.isnan(seconds) | (seconds < 0)
+    whole = np.clip(np.rint(np.where(missing, 0, seconds)), 0, 100 * 3600 - 1).astype(np.int64)
+
+    hours, rest = np.divmod(whole, 3600)
+    minutes, secs = np.divmod(rest, 60)
+    # Build the characters directly instead of calling str.format once per row
+    chars = np.empty((whole.size, 8), dtype=np.uint8)
+    chars[:, 0], chars[:, 1] = np.divmod(hours, 10)
+    chars[:, 3], chars[:, 4] = np.divmod(minutes, 10)
+    chars[:, 6], chars[:, 7] = np.divmod(secs, 10)
+    chars += ord("0")
+    chars[:, [2, 5]] = ord(":")
+    chars[missing] = 0
+
+    formatted = chars.view("S8").ravel().astype("U8")
+    return formatted[0] if scalar else formatted
+
+
+def add_duration_column(df, start_col="CallStart", end_col="CallEnd", name="Duration"):
+    """Add an int32 duration column (seconds) to df, parsing each time column once."""
+    df[name] = call_durations(df[start_col].to_numpy(), df[end_col].to_numpy())
+    return df
+
+
+def _as_seconds(values):
+    values = np.asarray(values)
+    if values.dtype.kind in "iu":
+        return values.astype(np.int32, copy=False)
+    return parse_hms(values)
+
+
+def _valid(durations):
+    durations = np.asarray(durations)
+    return durations[durations != MISSING]
+
+
+def _apply_durations(start, end):
+    # The original approach from car_insurance_calls.py, kept for the benchmark
+    df = pd.DataFrame({"Start": start, "End": end})
+    df["Start"] = pd.to_datetime(df["Start"], format="%H:%M:%S").dt.time
+    df["End"] = pd.to_datetime(df["End"], format="%H:%M:%S").dt.time
+    return df.apply(lambda row: (datetime.combine(datetime.min, row["End"]) - datetime.combine(datetime.min, row["Start"])).total_seconds(), axis=1)
+
+
+def benchmark(n_rows=1_000_000, seed=0):
+    """Time the row-wise apply approach against the vectorised one on random calls."""
+    rng = np.random.default_rng(seed)
+    # Keep calls within the same day so both approaches give the same answer
+    start = rng.integers(0, SECONDS_PER_DAY - 3600, n_rows)
+    end = start + rng.integers(0, 3600, n_rows)
+    start_str = format_hms(start)
+    end_str = format_hms(end)
+
+    tic = time.perf_counter()
+    apply_result = _apply_durations(start_str, end_str)
+    apply_time = time.perf_counter() - tic
+
+    tic = time.perf_counter()
+    vector_result = call_durations(start_str, end_str)
+    vector_time = time.perf_counter() - tic
+
+    assert np.array_equal(apply_result.to_numpy().astype(np.int32), vector_result)
+    print(f"rows: {n_rows:,}")
+    print(f"apply:      {apply_time:.3f}s")
+    print(f"vectorised: {vector_time:.3f}s ({apply_time / vector_time:.0f}x faster)")
+    return apply_time, vector_time
+
+
+# %%
+if __name__ == "__main__":
+    insurance_df = pd.read_csv("Car_Insurance.csv", index_col="Id")
+    add_duration_column(insurance_df)
+    print("Mean call duration:", format_hms(mean_duration(insurance_df["Duration"])))
+    print("Median / 95th percentile:", format_hms(percentile_duration(insurance_df["Duration"], [50, 95])))
+
+    benchmark()
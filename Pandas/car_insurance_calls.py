@@ -10,6 +10,15 @@ from datetime import datetime, timedelta
 car_insurance_df = pd.read_csv('Car_insurance.csv', index_col='Id')
 insurance_df = car_insurance_df.copy()
 
+# %%
+# read_csv parses the text again on every run. arrow_datasets converts the CSV once to an Arrow IPC file
+# (python arrow_datasets.py converts all the demo datasets) and load_dataset memory-maps it back, converting
+# it again only if the CSV has changed. columns= loads just the columns needed
+from arrow_datasets import load_dataset
+
+car_insurance_arrow_df = load_dataset("car_insurance")
+call_times_df = load_dataset("car_insurance", columns=["CallStart", "CallEnd"])
+
 # %%
 
 # How many missing values each column has?
@@ -103,9 +112,27 @@ seconds = mean_duration.components.seconds
 output = "{:02d}:{:02d}:{:02d}".format(hours, minutes, seconds)
 print(output)
 
+# %%
+# On large call logs the row-wise approach above gets slow.
+# call_durations.py parses each time column once into integer seconds and does the rest with NumPy
+# (mean_duration is imported as mean_call_duration so the mean_duration Timedelta above isn't overwritten)
+from call_durations import call_durations, format_hms, mean_duration as mean_call_duration
+
+calls_df = insurance_df.dropna()
+durations = call_durations(calls_df["CallStart"], calls_df["CallEnd"])
+print(format_hms(mean_call_duration(durations)))
+
 # %%
 # For those people contacted during the first half of the year (Jan-June). 
 # What is the most common way of communication (telephone, cellular...)?
+# insurance_stream.py answers this (and the mean duration) by reading the file in chunks,
+# so it also works for call logs that don't fit in memory
+from insurance_stream import aggregate_calls
+
+call_aggregates = aggregate_calls('Car_insurance.csv', chunksize=1000)
+print(call_aggregates.communication_counts(months=["jan", "feb", "mar", "apr", "may", "jun"]))
+print("Most common:", call_aggregates.most_common_communication())
+print("Mean duration:", format_hms(call_aggregates.mean_duration()))
 
 # %%
 
@@ -0,0 +1,104 @@
+# %%
+# Coercing messy columns (e.g. CANCELLED / DIVERTED in the flights data) to clean types.
+# data_cleaning.py cleans flights_df['CANCELLED'] with chained .replace(..., inplace=True)
+# calls and then .astype('bool'). Each replace is a full scan of an object column,
+# anything the mapping misses is silently turned into True by astype('bool'),
+# and the same has to be repeated for DIVERTED.
+# coerce_columns() factorizes each column once, maps only its distinct values
+# through the mapping table and builds the result from the factorize codes.
+# Values the mapping doesn't know become <NA> and are reported.
+import numpy as np
+import pandas as pd
+
+# The mapping_dictionary from data_cleaning.py, plus the usual spellings
+BOOLEAN_MAPPING = {
+    '0': False, '1': True,
+    'F': False, 'T': True,
+    'False': False, 'True': True,
+    'N': False, 'Y': True,
+    'No': False, 'Yes': True,
+    False: False, True: True,
+    0.0: False, 1.0: True,
+}
+
+
+def coerce_column(series, mapping=BOOLEAN_MAPPING, dtype="boolean", ignore_case=True):
+    """Map the values of series through mapping in a single pass.
+
+    dtype is "boolean" (nullable booleans) or "category" (the mapped values
+    become the categories). Missing values stay missing. Returns the new
+    Series and a Series with the counts of the values the mapping didn't
+    know (these become <NA> in the result).
+    """
+    codes, uniques = pd.factorize(series)
+    lookup = _normalized_lookup(mapping, ignore_case)
+    mapped = [_map_value(value, mapping, lookup, ignore_case) for value in uniques]
+    known = np.array([value is not _UNMAPPED for value in mapped], dtype=bool)
+
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    unmapped = pd.Series(counts[~known], index=pd.Index(np.asarray(uniques, dtype=object)[~known]),
+                         name=series.name, dtype="int64")
+
+    if dtype == "boolean":
+        values = np.array([bool(v) if k else False for v, k in zip(mapped, known)] + [False])
+        mask = np.append(~known, True)  # the extra slot is for code -1 (missing)
+        result = pd.arrays.BooleanArray(values[codes], mask[codes])
+    elif dtype == "category":
+        categories = pd.Index(pd.unique(pd.Series([v for v, k in zip(mapped, known) if k], dtype=object)))
+        new_codes = np.append([categories.get_loc(v) if k else -1 for v, k in zip(mapped, known)], -1)
+        result = pd.Categorical.from_codes(new_codes[codes].astype(np.int64), categories)
+    else:
+        raise ValueError(f"dtype must be 'boolean' or 'category', not {dtype!r}")
+    return pd.Series(result, index=series.index, name=series.name), unmapped
+
+
+def coerce_columns(df, columns, mapping=BOOLEAN_MAPPING, dtype="boolean", ignore_case=True, errors="report"):
+    """Coerce several columns of df at once.
+
+    Returns a copy of df with the columns replaced and a dict of
+    column -> counts of unmapped values (only columns that had any).
+    With errors="raise" a ValueError is raised instead if any value is unmapped.
+    """
+    df = df.copy()
+    report = {}
+    for col in columns:
+        df[col], unmapped = coerce_column(df[col], mapping, dtype, ignore_case)
+        if len(unmapped):
+            report[col] = unmapped
+    if errors == "raise" and report:
+        details = "; ".join(f"{col}: {list(values.index)}" for col, values in report.items())
+        raise ValueError(f"Unmapped values found - {details}")
+    return df, report
+
+
+_UNMAPPED = object()
+
+
+def _normalized_lookup(mapping, ignore_case):
+    return {_normalize(key, ignore_case): value for key, value in mapping.items()}
+
+
+def _normalize(value, ignore_case):
+    text = str(value).strip()
+    return text.lower() if ignore_case else text
+
+
+def _map_value(value, mapping, lookup, ignore_case):
+    try:
+        if value in mapping:
+            return mapping[value]
+    except TypeError:  # unhashable values
+        pass
+    return lookup.get(_normalize(value, ignore_case), _UNMAPPED)
+
+
+# %%
+if __name__ == "__main__":
+    flights_df = pd.DataFrame({
+        'CANCELLED': ['0', 'F', 'False', False, '1', 'T', 'True', None, 'maybe'],
+        'DIVERTED': ['0', '0', 'F', 'False', False, '1', True, 0, 'yes'],
+    })
+    cleaned_df, report = coerce_columns(flights_df, ['CANCELLED', 'DIVERTED'])
+    print(cleaned_df)
+    print(cleaned_df.dtypes)
+    print(report)
@@ -58,6 +58,14 @@ sf_sal.info()
 
 sf_sal.describe()
 
+# %%
+# Most of the text columns only hold a few distinct values and the pay columns don't need float64.
+# salary_loader.py reads the same data with a declared schema (category / float32 / int16)
+from salary_loader import load_salaries, memory_report
+
+sf_sal_typed = load_salaries('data.csv')
+memory_report(sf_sal, sf_sal_typed)
+
 
 # %% [markdown]
 # Lambda/Anonymous Expressions with .apply() method
@@ -105,6 +113,13 @@ sf_sal.head()
 sf_sal["isFire"] = sf_sal["JobTitle"].apply(lambda x:"FIRE" in x)
 sf_sal.head()
 
+# %%
+# Each apply above is a full pass over the column calling a Python function per row.
+# department_features.py works on the distinct job titles only and finds all the departments in one pass
+from department_features import department_flags
+
+department_flags(sf_sal["JobTitle"]).sum()
+
 # %%
 # check how many "POLICE" Dept staff there are in the dataframe
 # sum
@@ -116,6 +131,15 @@ total_Fire = sf_sal["isFire"].sum()
 # Ratio: Fire/Poilce
 ratio_fire_to_police = total_Fire/total_Police
 print(ratio_fire_to_police)
+
+# %%
+# DepartmentIndex (department_index.py) builds count/sum/min/max per department and year in one groupby,
+# so the ratio and the mean salaries below become lookups instead of new passes over sf_sal
+from department_index import DepartmentIndex
+
+department_index = DepartmentIndex(sf_sal)
+print(department_index.ratio("Fire", "Police"))
+print(department_index.mean("Police", "BasePay"), department_index.mean("Fire", "BasePay"))
 # %%
 #filter dataframe for when isPolice is True
 df_police = sf_sal[sf_sal["isPolice"]==True]
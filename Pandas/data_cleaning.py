@@ -112,6 +112,14 @@ pd.to_datetime(flights_df['FLIGHTDATE']).head(5)
 date_format = "%Y%m%d"
 pd.to_datetime(flights_df["FLIGHTDATE"], format=date_format)
 
+# %%
+# For full-size flight histories that don't fit in memory, flights_pipeline.py runs the cleaning steps
+# from this notebook chunk by chunk and writes Parquet partitioned by year and month of FLIGHTDATE.
+# If it fails part way, running it again carries on from the last finished chunk.
+# from flights_pipeline import clean_flights
+# clean_flights("flights_sample.csv", "flights_clean")
+# pd.read_parquet("flights_clean", filters=[("year", "=", 2023)])
+
 # %% [markdown]
 # Common Issues: Mixed Date Formats
 # %%
@@ -150,6 +158,16 @@ print(mixed_date_df)
 print("\nData types:\n")
 print(mixed_date_df.dtypes)
 
+# %%
+# apply(parse) calls dateutil once per row, which is slow on big columns.
+# parse_dates (date_parsing.py) parses each distinct string once, works out the formats in the column
+# and parses each format group with pd.to_datetime(format=...), leaving only the leftovers to dateutil
+from date_parsing import parse_dates
+
+mixed_date_df['dates'], report = parse_dates(mixed_date_df['mixed_dates'], return_report=True)
+print(mixed_date_df)
+print(report)
+
 # %% [markdown]
 # The timedelta64 Data Type
 # %%
@@ -282,6 +300,15 @@ print('datatype of flights_df["CANCELLED"]:')
 print(flights_df['CANCELLED'].dtype)
 
 flights_df['CANCELLED'].value_counts() # note that the result of value_counts will always show the data type as an integer, as it is a count.
+# %%
+# Each .replace() above scans the whole column again, and astype('bool') turns anything left unmapped into True.
+# coerce_columns (column_coercion.py) maps only the distinct values, handles several columns in one call
+# and reports the values it could not map instead of guessing
+from column_coercion import coerce_columns, BOOLEAN_MAPPING
+
+flights_df, unmapped = coerce_columns(flights_df, ['CANCELLED', 'DIVERTED'], mapping=BOOLEAN_MAPPING)
+print(flights_df[['CANCELLED', 'DIVERTED']].dtypes)
+print(unmapped)
 # %% [markdown]
 # Forcing Values to Adhere to a Pattern
 # A regular expression, often abbreviated as regex, 
@@ -324,6 +351,17 @@ phone_df
 
 phone_df['Phone'] = phone_df['Phone'].replace({r'\+44': '0', r'\(': '', r'\)': '', r'-': '', r' ': ''}, regex=True)
 phone_df
+
+# %%
+# The steps above are three separate passes over the column.
+# normalize_phones (phone_numbers.py) validates and cleans each distinct number in one regex match
+# and reports how many numbers were invalid
+from phone_numbers import normalize_phones
+
+phone_df = pd.DataFrame(data)
+phone_df['Phone'], report = normalize_phones(phone_df['Phone'], return_report=True)
+print(phone_df)
+print(report)
 # %% [markdown]
 # Unique Values
 # The unique method returns all the unique (i.e. distinct) values in the data series. For example from a series of [ 1, 1, 2, 3, 4] it would return [1, 2, 3, 4]
@@ -398,6 +436,16 @@ fuzzy_duplicates_df
 # for example this python library: https://pypi.org/project/fuzzywuzzy/ that uses the Levenshtein Distance 
 # to calculate the differences between strings.
 
+# %%
+# Comparing every pair of rows is quadratic, which doesn't work for millions of customers.
+# find_duplicates (fuzzy_duplicates.py) only compares rows that share a blocking key (name, phone)
+# or whose emails look alike (MinHash/LSH), and gives every row a cluster ID
+from fuzzy_duplicates import find_duplicates
+
+fuzzy_duplicates_df['cluster_id'] = find_duplicates(
+    fuzzy_duplicates_df, block_on=[['First_Name', 'Last_Name'], ['Phone']], lsh_on='Email')
+fuzzy_duplicates_df
+
 
 # %% [markdown]
 
@@ -470,3 +518,13 @@ print(flights)
 # but the right bin edge is not.
 # Finally, we display the original and modified dataframes to observe the changes
 # %%
+# binning.py does the same with precomputed edges and np.searchsorted, and can also bin by quantiles
+# estimated batch by batch (QuantileBinner), so streaming data never needs the quantiles of the full dataset
+from binning import Binner, QuantileBinner
+
+haul_binner = Binner(bin_edges, bin_labels, right=False)
+flights['Flight Type'] = haul_binner.transform(flights['Distance'])
+distance_quartiles = QuantileBinner(n_bins=4).partial_fit(flights['Distance'])
+flights['Distance Quartile'] = distance_quartiles.transform(flights['Distance'])
+print(flights)
+# %%
@@ -0,0 +1,162 @@
+# %%
+# Fast parsing of date columns with mixed formats.
+# data_cleaning.py falls back to mixed_date_df['mixed_dates'].apply(parse) when a
+# column mixes formats, which calls dateutil once per row. parse_dates():
+#   1. de-duplicates the strings, so every distinct value is parsed only once
+#   2. works out a small set of formats from a sample of the distinct values
+#   3. parses each format group with pd.to_datetime(format=...), which is vectorised
+#   4. only sends what is left over (the residue) to dateutil
+import time
+from datetime import timezone
+
+import numpy as np
+import pandas as pd
+from dateutil.parser import parse
+
+# Formats tried when inferring the formats of a column. Ambiguous day/month
+# orders are listed both ways; the one that fits more of the data wins.
+CANDIDATE_FORMATS = [
+    "%Y-%m-%d",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y%m%d",
+    "%Y/%m/%d",
+    "%m/%d/%Y",
+    "%d/%m/%Y",
+    "%m/%d/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M:%S",
+    "%m-%d-%Y",
+    "%d-%m-%Y",
+    "%d.%m.%Y",
+    "%d-%b-%Y",
+    "%d %b %Y",
+    "%d %B %Y",
+    "%d %B, %Y",
+    "%B %d, %Y",
+    "%b %d, %Y",
+]
+
+
+def infer_formats(values, formats=CANDIDATE_FORMATS, max_formats=5, sample_size=2_000, dayfirst=False, seed=0):
+    """Pick up to max_formats formats that together cover a sample of values.
+
+    Formats are chosen greedily: the one that parses the most sampled values
+    first, then the one that parses the most of what is left, and so on.
+    Ties go to the day-first or month-first reading depending on dayfirst.
+    """
+    values = pd.Series(pd.unique(pd.Series(values).dropna().astype(str)))
+    if len(values) > sample_size:
+        values = values.sample(sample_size, random_state=seed)
+    formats = _order_formats(formats, dayfirst)
+
+    chosen = []
+    remaining = values
+    while len(remaining) and len(chosen) < max_formats:
+        best_format, best_mask = None, None
+        for fmt in formats:
+            if fmt in chosen:
+                continue
+            mask = pd.to_datetime(remaining, format=fmt, errors="coerce").notna()
+            if mask.any() and (best_mask is None or mask.sum() > best_mask.sum()):
+                best_format, best_mask = fmt, mask
+        if best_format is None:
+            break
+        chosen.append(best_format)
+        remaining = remaining[~best_mask]
+    return chosen
+
+
+def parse_dates(values, formats=None, dayfirst=False, fallback=True, return_report=False, **infer_kwargs):
+    """Parse a column of date strings in mixed formats into datetime64.
+
+    formats defaults to infer_formats(values). Values no format matches are
+    parsed with dateutil if fallback is True, and become NaT if they can't
+    be parsed at all. Values with a UTC offset or time zone are converted to
+    UTC, and the result is tz-naive. With return_report=True a dict is also returned with the
+    formats used and how many distinct values each one (and dateutil) handled.
+    """
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques, dtype=object).astype(str)
+    if formats is None:
+        formats = infer_formats(uniques, dayfirst=dayfirst, **infer_kwargs)
+
+    parsed = pd.Series(pd.NaT, index=uniques.index, dtype="datetime64[ns]")
+    todo = np.ones(len(uniques), dtype=bool)
+    report = {"distinct_values": len(uniques), "formats": {}}
+    for fmt in formats:
+        if not todo.any():
+            break
+        group = pd.to_datetime(uniques[todo], format=fmt, errors="coerce")
+        hit = group.notna()
+        parsed[hit[hit].index] = group[hit]
+        todo[hit[hit].index] = False
+        report["formats"][fmt] = int(hit.sum())
+
+    report["dateutil"] = 0
+    if fallback and todo.any():
+        residue = pd.Series([_parse_or_nat(v, dayfirst) for v in uniques[todo]], index=uniques.index[todo])
+        residue = pd.to_datetime(residue, errors="coerce")
+        parsed[residue.index] = residue
+        report["dateutil"] = int(residue.notna().sum())
+    report["unparsed"] = int(parsed.isna().sum())
+
+    result = np.append(parsed.to_numpy(), np.datetime64("NaT"))[codes]
+    result = pd.Series(result, index=values.index, name=values.name)
+    if return_report:
+        return result, report
+    return result
+
+
+def _order_formats(formats, dayfirst):
+    # Put the day-first (or month-first) variant of each ambiguous pair first
+    preferred = "%d" if dayfirst else "%m"
+    return sorted(formats, key=lambda fmt: 0 if fmt.startswith(preferred) or "%Y" in fmt[:2] else 1)
+
+
+def _parse_or_nat(value, dayfirst):
+    try:
+        parsed = parse(value, dayfirst=dayfirst)
+        if parsed.tzinfo is not None:
+            # "2023-01-02T10:00:00+01:00": to UTC, so it fits the tz-naive column
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+    except (ValueError, OverflowError):
+        return pd.NaT
+
+
+def benchmark(n_rows=2_000_000, n_distinct=20_000, apply_rows=200_000, seed=0):
+    """Compare rows/second (and accuracy) of apply(parse) and parse_dates on a mixed-format column."""
+    rng = np.random.default_rng(seed)
+    days = pd.Timestamp("1950-01-01") + pd.to_timedelta(rng.integers(0, 365 * 70, n_distinct), unit="D")
+    styles = ["%d/%m/%Y", "%Y-%m-%d", "%d-%b-%Y", "%Y%m%d"]
+    distinct = np.array([day.strftime(styles[i % len(styles)]) for i, day in enumerate(days)], dtype=object)
+    picks = rng.integers(0, n_distinct, n_rows)
+    column = pd.Series(distinct[picks])
+    truth = pd.Series(days[picks])
+
+    sample = column[:apply_rows]
+    tic = time.perf_counter()
+    by_apply = pd.to_datetime(sample.apply(lambda x: parse(x, dayfirst=True)))
+    apply_rate = len(sample) / (time.perf_counter() - tic)
+
+    tic = time.perf_counter()
+    result, report = parse_dates(column, dayfirst=True, return_report=True)
+    fast_rate = len(column) / (time.perf_counter() - tic)
+
+    # dateutil's dayfirst=True also swaps day and month in ISO dates like 1952-11-12
+    apply_correct = (by_apply == truth[:apply_rows]).mean()
+    fast_correct = (result == truth).mean()
+    print(report)
+    print(f"apply(parse): {apply_rate:,.0f} rows/s, {apply_correct:.1%} correct (measured on {len(sample):,} rows)")
+    print(f"parse_dates:  {fast_rate:,.0f} rows/s, {fast_correct:.1%} correct (measured on {len(column):,} rows)")
+    return apply_rate, fast_rate
+
+
+# %%
+if __name__ == "__main__":
+    mixed_date_df = pd.DataFrame({'mixed_dates': ['01/02/2023', '2023-03-01', '04-Apr-2023', '20230505']})
+    mixed_date_df['dates'] = parse_dates(mixed_date_df['mixed_dates'])
+    print(mixed_date_df)
+
+    benchmark()
@@ -0,0 +1,165 @@
+# %%
+# Department-level aggregate index for salary statistics.
+# concepts_and_dataframe_operations.py filters the frame into df_police / df_fire
+# and then scans it again for every statistic (mean, sum/count, apply(...).sum()).
+# DepartmentIndex does a single groupby over (Department, Year) and keeps, for
+# every pay column, the count, sum, sum of squares, min and max. Means, standard
+# deviations and ratios between departments are then read off that small table,
+# and new rows can be folded in without going back over the old ones.
+import numpy as np
+import pandas as pd
+
+from department_features import DEPARTMENT_KEYWORDS, primary_department
+
+PAY_COLUMNS = ["BasePay", "OvertimePay", "OtherPay", "Benefits", "TotalPay", "TotalPayBenefits"]
+STATS = ["count", "sum", "sumsq", "min", "max"]
+
+
+class DepartmentIndex:
+    """Per-department, per-year aggregates of the pay columns.
+
+    By default the department of each row is worked out from JobTitle with
+    department_features.primary_department; pass department_col to use a
+    column that is already in the data instead.
+    """
+
+    def __init__(self, df=None, pay_columns=PAY_COLUMNS, departments=DEPARTMENT_KEYWORDS,
+                 department_col=None, title_col="JobTitle", year_col="Year"):
+        self.pay_columns = list(pay_columns)
+        self.departments = departments
+        self.department_col = department_col
+        self.title_col = title_col
+        self.year_col = year_col
+        columns = pd.MultiIndex.from_product([self.pay_columns, STATS])
+        self.table = pd.DataFrame(columns=columns, index=pd.MultiIndex.from_tuples([], names=["Department", "Year"]))
+        self.rows = pd.Series(dtype="int64")
+        self._totals = None
+        if df is not None:
+            self.update(df)
+
+    def update(self, df):
+        """Fold new rows into the index."""
+        partial, rows = self._aggregate(df)
+        if self.table.empty:
+            self.table, self.rows = partial, rows
+        else:
+            self.table, self.rows = _combine(self.table, partial), self.rows.add(rows, fill_value=0).astype("int64")
+        self._totals = None
+        return self
+
+    def count(self, department, year=None):
+        """Number of rows in department (optionally for one year)."""
+        if year is None:
+            return int(self._department_totals()[1].get(department, 0))
+        return int(self.rows.get((department, year), 0))
+
+    def sum(self, department, column, year=None):
+        return self._stats(department, column, year)["sum"]
+
+    def mean(self, department, column, year=None):
+        """Mean of column over the non-missing values, like df[mask][column].mean()."""
+        stats = self._stats(department, column, year)
+        return stats["sum"] / stats["count"] if stats["count"] else np.nan
+
+    def std(self, department, column, year=None, ddof=1):
+        """Standard deviation of column (sample std by default, like pandas)."""
+        stats = self._stats(department, column, year)
+        n = stats["count"]
+        if n - ddof <= 0:
+            return np.nan
+        variance = (stats["sumsq"] - stats["sum"] ** 2 / n) / (n - ddof)
+        return np.sqrt(max(variance, 0.0))
+
+    def min(self, department, column, year=None):
+        return self._stats(department, column, year)["min"]
+
+    def max(self, department, column, year=None):
+        return self._stats(department, column, year)["max"]
+
+    def ratio(self, department_a, department_b, year=None):
+        """Number of people in department_a over the number in department_b."""
+        return self.count(department_a, year) / self.count(department_b, year)
+
+    def summary(self, column):
+        """count / mean / std / min / max of column for every department (all years)."""
+        totals = self._department_totals()[0]
+        departments = totals.index
+        return pd.DataFrame({
+            "count": totals[(column, "count")].astype("int64"),
+            "mean": [self.mean(d, column) for d in departments],
+            "std": [self.std(d, column) for d in departments],
+            "min": totals[(column, "min")],
+            "max": totals[(column, "max")],
+        }, index=departments)
+
+    def _stats(self, department, column, year):
+        if year is None:
+            table = self._department_totals()[0]
+            key = department
+        else:
+            table = self.table
+            key = (department, year)
+        if key not in table.index:
+            return {"count": 0, "sum": 0.0, "sumsq": 0.0, "min": np.nan, "max": np.nan}
+        return table.loc[key, column]
+
+    def _department_totals(self):
+        # Collapse the years once after each update so the all-years queries are plain lookups
+        if self._totals is None:
+            grouped = self.table.groupby(level="Department")
+            totals, mins, maxs = grouped.sum(), grouped.min(), grouped.max()
+            for column in self.pay_columns:
+                totals[(column, "min")] = mins[(column, "min")]
+                totals[(column, "max")] = maxs[(column, "max")]
+            self._totals = (totals, self.rows.groupby(level=0).sum())
+        return self._totals
+
+    def _aggregate(self, df):
+        if self.department_col is not None:
+            department = df[self.department_col]
+        else:
+            department = primary_department(df[self.title_col], self.departments)
+        keys = [department.rename("Department"), df[self.year_col].rename("Year")]
+
+        values = df[self.pay_columns].astype("float64")
+        squares = values ** 2
+        squares.columns = [f"{c}__sq" for c in self.pay_columns]
+        # One groupby pass for all the statistics of all the pay columns
+        grouped = pd.concat([values, squares], axis=1).groupby(keys, observed=True)
+        counts, sums, mins, maxs = grouped.count(), grouped.sum(), grouped.min(), grouped.max()
+
+        table = pd.concat({
+            column: pd.DataFrame({
+                "count": counts[column],
+                "sum": sums[column],
+                "sumsq": sums[f"{column}__sq"],
+                "min": mins[column],
+                "max": maxs[column],
+            })
+            for column in self.pay_columns
+        }, axis=1)
+        return table, grouped.size()
+
+
+def _combine(old, new):
+    index = old.index.union(new.index)
+    old, new = old.reindex(index), new.reindex(index)
+    combined = old.copy()
+    for column in old.columns.get_level_values(0).unique():
+        for stat in ["count", "sum", "sumsq"]:
+            combined[(column, stat)] = old[(column, stat)].fillna(0) + new[(column, stat)].fillna(0)
+        combined[(column, "min")] = np.fmin(old[(column, "min")], new[(column, "min")])
+        combined[(column, "max")] = np.fmax(old[(column, "max")], new[(column, "max")])
+    return combined
+
+
+# %%
+if __name__ == "__main__":
+    sf_sal = pd.read_csv("data.csv", index_col="Id")
+    index = DepartmentIndex(sf_sal.iloc[:400])
+    index.update(sf_sal.iloc[400:])
+
+    print("Fire / Police:", index.ratio("Fire", "Police"))
+    print("Mean police BasePay:", index.mean("Police", "BasePay"))
+    print("Mean fire BasePay:", index.mean("Fire", "BasePay"))
+    print(index.summary("BasePay"))
@@ -0,0 +1,180 @@
+# %%
+# Out-of-core cleaning pipeline for the flights data.
+# data_cleaning.py loads flights_sample.csv in one go and fixes it up cell by
+# cell: FLIGHTDATE from YYYYMMDD integers to datetime64, CANCELLED / DIVERTED to
+# booleans, distances binned into short / medium / long haul...
+# Here the same steps are declared once as a list of stages. The CSV is streamed
+# in chunks, every stage runs on each chunk, and each chunk is written to Parquet
+# partitioned by year and month of FLIGHTDATE:
+#     out_dir/year=2023/month=1/part-00000.parquet
+# Finished chunks are recorded in out_dir/_progress.json, so a run that fails
+# half way through can be started again and carries on where it stopped.
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from binning import Binner
+from column_coercion import BOOLEAN_MAPPING, coerce_column
+
+# The cleaning steps from data_cleaning.py, as (stage name, parameters)
+FLIGHTS_STAGES = [
+    ("to_datetime", {"columns": {"FLIGHTDATE": "%Y%m%d"}}),
+    ("to_numeric", {"columns": ["DISTANCE", "DEPDELAY", "ARRDELAY"]}),
+    ("to_boolean", {"columns": ["CANCELLED", "DIVERTED"], "mapping": BOOLEAN_MAPPING}),
+    ("bin", {"column": "DISTANCE", "name": "FLIGHTTYPE", "edges": [0, 1500, 4000, 12000],
+             "labels": ["short haul", "medium haul", "long haul"]}),
+]
+
+
+def to_datetime(chunk, report, columns):
+    for col, fmt in columns.items():
+        if col in chunk:
+            chunk[col] = pd.to_datetime(chunk[col].astype("string"), format=fmt, errors="coerce")
+    return chunk
+
+
+def to_numeric(chunk, report, columns):
+    for col in columns:
+        if col in chunk:
+            chunk[col] = pd.to_numeric(chunk[col], errors="coerce")
+    return chunk
+
+
+def to_boolean(chunk, report, columns, mapping=BOOLEAN_MAPPING):
+    for col in columns:
+        if col in chunk:
+            chunk[col], unmapped = coerce_column(chunk[col], mapping)
+            # Keep a running count of the values the mapping didn't know
+            counts = report.setdefault("unmapped", {}).setdefault(col, {})
+            for value, count in unmapped.items():
+                counts[str(value)] = counts.get(str(value), 0) + int(count)
+    return chunk
+
+
+def bin_column(chunk, report, column, name, edges, labels):
+    if column in chunk:
+        chunk[name] = Binner(edges, labels, right=False).transform(chunk[column])
+    return chunk
+
+
+# Stage name -> function(chunk, report, **params) returning the cleaned chunk
+STAGES = {
+    "to_datetime": to_datetime,
+    "to_numeric": to_numeric,
+    "to_boolean": to_boolean,
+    "bin": bin_column,
+}
+
+
+def clean_flights(path, out_dir, stages=FLIGHTS_STAGES, date_col="FLIGHTDATE", chunksize=250_000, **read_csv_kwargs):
+    """Stream the CSV at path through stages and write partitioned Parquet to out_dir.
+
+    Can be re-run after a failure: chunks already listed in _progress.json are
+    skipped. The input file (path, size and modification time), chunksize,
+    stages and read options are stored with the progress, and a run with
+    different ones raises ValueError instead of resuming, since its chunk
+    numbers would mean different rows. Returns the run report (rows per
+    chunk and unmapped values).
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    progress_path = out_dir / "_progress.json"
+    run = _run_settings(path, stages, date_col, chunksize, read_csv_kwargs)
+    if progress_path.exists():
+        progress = json.loads(progress_path.read_text())
+        previous = progress.get("run") or {}
+        changed = [key for key in run if previous.get(key) != run[key]]
+        if changed:
+            raise ValueError(f"{out_dir} holds a run with a different {', '.join(changed)}; "
+                             "use another out_dir or delete it to start again")
+    else:
+        progress = {"run": run, "done": [], "report": {}}
+    done = set(progress["done"])
+    report = progress["report"]
+
+    for number, chunk in enumerate(pd.read_csv(path, chunksize=chunksize, **read_csv_kwargs)):
+        if number in done:
+            continue
+        for stage_name, params in stages:
+            chunk = STAGES[stage_name](chunk, report, **params)
+        _write_partitions(chunk, out_dir, date_col, number)
+
+        # Only mark the chunk as done once all its files are written
+        progress["done"].append(number)
+        report.setdefault("rows", {})[str(number)] = len(chunk)
+        _atomic_write(progress_path, json.dumps(progress, indent=2).encode())
+
+    (out_dir / "_SUCCESS").touch()
+    return report
+
+
+def _run_settings(path, stages, date_col, chunksize, read_csv_kwargs):
+    # What decides which rows each chunk number holds and what is written for it, as plain JSON values
+    stat = os.stat(path)
+    settings = {
+        "path": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "chunksize": chunksize,
+        "date_col": date_col,
+        "stages": stages,
+        "read_csv_kwargs": read_csv_kwargs,
+    }
+    return json.loads(json.dumps(settings, default=repr))
+
+
+def _write_partitions(chunk, out_dir, date_col, number):
+    dates = chunk[date_col]
+    years = dates.dt.year.fillna(-1).astype("int64")
+    months = dates.dt.month.fillna(-1).astype("int64")
+    for (year, month), part in chunk.groupby([years, months], sort=False):
+        # Rows with an unparseable date go to year=-1/month=-1 rather than being dropped
+        part_dir = out_dir / f"year={year}" / f"month={month}"
+        part_dir.mkdir(parents=True, exist_ok=True)
+        # The file name only depends on the chunk number, so a re-run overwrites a half-written chunk
+        tmp_path = part_dir / f".part-{number:05d}.parquet.tmp"
+        part.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, part_dir / f"part-{number:05d}.parquet")
+
+
+def _atomic_write(path, data):
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def _synthetic_flights(path, n_rows=1_000_000, seed=0):
+    # A stand-in for flights_sample.csv with the same messy columns
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2022-01-01") + pd.to_timedelta(rng.integers(0, 730, n_rows), unit="D")
+    messy_booleans = np.array(["0", "1", "F", "T", "False", "True"], dtype=object)
+    pd.DataFrame({
+        "FLIGHTDATE": dates.strftime("%Y%m%d").astype(int),
+        "AIRLINECODE": rng.choice(["AA", "DL", "UA", "WN"], n_rows),
+        "DISTANCE": rng.integers(50, 11000, n_rows),
+        "DEPDELAY": rng.normal(5, 20, n_rows).round(),
+        "ARRDELAY": rng.normal(5, 25, n_rows).round(),
+        "CANCELLED": messy_booleans[rng.integers(0, 6, n_rows)],
+        "DIVERTED": messy_booleans[rng.integers(0, 6, n_rows)],
+    }).to_csv(path, index=False)
+
+
+# %%
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "flights_sample.csv"
+        _synthetic_flights(csv_path)
+        tic = time.perf_counter()
+        report = clean_flights(csv_path, Path(tmp) / "flights_clean")
+        print(f"Cleaned {sum(report['rows'].values()):,} rows in {time.perf_counter() - tic:.1f}s")
+        print("Unmapped values:", report.get("unmapped"))
+
+        flights_clean = pd.read_parquet(Path(tmp) / "flights_clean", filters=[("year", "=", 2023), ("month", "=", 1)])
+        print(flights_clean.head())
+        print(flights_clean.dtypes)
@@ -0,0 +1,153 @@
+# %%
+# A faster random-forest iterative imputer.
+# missing_values.py imputes pima_df with
+# IterativeImputer(estimator=RandomForestRegressor(), random_state=42), which
+# fits a fresh 100-tree forest for every column in every one of its 10 rounds
+# and is by far the slowest imputer in the notebook. ForestImputer does the
+# same kind of round-robin imputation (missForest), but:
+#   - the columns of a round are fitted at the same time, in a thread pool
+#     (tree fitting in sklearn runs without the GIL), each on the values
+#     imputed in the previous round
+#   - after the first round the forests are warm-started: only a quarter of
+#     the trees are refitted on the new values, the rest are kept
+#   - each forest trains on at most max_train_rows rows and bootstraps only
+#     max_samples of them
+#   - it stops as soon as the imputed values stop getting closer to a fixed
+#     point (as missForest does), or when the next round would go over
+#     time_budget seconds
+import copy
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.ensemble import RandomForestRegressor
+
+
+class ForestImputer(TransformerMixin, BaseEstimator):
+    """Iterative imputation with warm-started random forests, one per column with gaps.
+
+    refresh is the fraction of each forest refitted per round after the
+    first. The change of a round is the largest change of an imputed value,
+    relative to the largest absolute value in the data. Rounds stop when the
+    change is below tol, or when it grows again (the previous round's values
+    are kept then, as in missForest), or when another round would not fit in
+    time_budget seconds (the first round always runs). After fitting,
+    n_iter_ is the number of rounds whose values were kept (forests_ are
+    the forests of the last of them) and changes_ the change of every round
+    run, including one that was thrown away.
+    """
+
+    def __init__(self, n_estimators=100, max_iter=10, tol=1e-3, refresh=0.25, max_samples=None,
+                 max_train_rows=None, time_budget=None, n_jobs=None, random_state=None):
+        self.n_estimators = n_estimators
+        self.max_iter = max_iter
+        self.tol = tol
+        self.refresh = refresh
+        self.max_samples = max_samples
+        self.max_train_rows = max_train_rows
+        self.time_budget = time_budget
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    def fit_transform(self, X, y=None):
+        if self.max_iter < 1:
+            raise ValueError(f"max_iter must be at least 1, got {self.max_iter}")
+        frame = X if isinstance(X, pd.DataFrame) else None
+        values = np.array(X, dtype=np.float64)
+        missing = np.isnan(values)
+        self.means_ = np.nanmean(values, axis=0)
+        filled = np.where(missing, self.means_, values)
+        self.columns_ = [j for j in np.argsort(missing.sum(axis=0), kind="stable") if 0 < missing[:, j].sum() < len(values)]
+        self.forests_ = {}
+        self.changes_ = []
+        self.n_iter_ = 0
+        rng = np.random.default_rng(self.random_state)
+        scale = np.abs(values[~missing]).max() if (~missing).any() else 1.0
+
+        tic = time.perf_counter()
+        with ThreadPoolExecutor(self.n_jobs) as pool:
+            for _ in range(self.max_iter):
+                round_start = time.perf_counter()
+                seeds = rng.integers(0, 2**31 - 1, len(self.columns_))
+                fitted = list(pool.map(lambda args: self._fit_column(filled, missing, *args),
+                                       zip(self.columns_, seeds)))
+                new = filled.copy()
+                for j, (_, predicted) in zip(self.columns_, fitted):
+                    new[missing[:, j], j] = predicted
+                change = np.abs(new - filled)[missing].max(initial=0.0) / scale
+                self.changes_.append(change)
+                if len(self.changes_) > 1 and change > self.changes_[-2]:
+                    break
+                # The round is kept: its values and the forests that predicted them
+                filled = new
+                self.forests_ = {j: forest for j, (forest, _) in zip(self.columns_, fitted)}
+                self.n_iter_ += 1
+                elapsed, round_time = time.perf_counter() - tic, time.perf_counter() - round_start
+                if change < self.tol:
+                    break
+                if self.time_budget is not None and elapsed + round_time > self.time_budget:
+                    break
+        return pd.DataFrame(filled, index=frame.index, columns=frame.columns) if frame is not None else filled
+
+    def fit(self, X, y=None):
+        self.fit_transform(X)
+        return self
+
+    def transform(self, X):
+        """Fill the gaps of new data: column means, then one pass of the fitted forests."""
+        frame = X if isinstance(X, pd.DataFrame) else None
+        values = np.array(X, dtype=np.float64)
+        missing = np.isnan(values)
+        filled = np.where(missing, self.means_, values)
+        for j in self.columns_:
+            rows = missing[:, j]
+            if rows.any():
+                filled[rows, j] = self.forests_[j].predict(np.delete(filled[rows], j, axis=1))
+        return pd.DataFrame(filled, index=frame.index, columns=frame.columns) if frame is not None else filled
+
+    def _fit_column(self, filled, missing, j, seed):
+        # Fit (or warm-start) a forest for column j on the rows where it is known; returns it and its predictions
+        # where the column isn't known. The forest of the previous round is copied, not changed, in case this
+        # round is thrown away
+        features = np.delete(filled, j, axis=1)
+        train = np.flatnonzero(~missing[:, j])
+        if self.max_train_rows is not None and len(train) > self.max_train_rows:
+            train = np.random.default_rng(seed).choice(train, self.max_train_rows, replace=False)
+
+        forest = self.forests_.get(j)
+        if forest is None:
+            forest = RandomForestRegressor(n_estimators=self.n_estimators, max_samples=self.max_samples,
+                                           warm_start=True, n_jobs=1, random_state=seed)
+        else:
+            # Drop the oldest trees; warm_start then only fits the missing ones on the new values
+            n_new = max(1, int(round(self.refresh * self.n_estimators)))
+            forest = copy.copy(forest)
+            forest.estimators_ = forest.estimators_[n_new:]
+            forest.set_params(random_state=seed)
+        forest.fit(features[train], filled[train, j])
+        return forest, forest.predict(features[missing[:, j]])
+
+
+# %%
+if __name__ == "__main__":
+    from sklearn.experimental import enable_iterative_imputer  # noqa: F401
+    from sklearn.impute import IterativeImputer
+
+    from imputation_benchmark import run_benchmark
+
+    pima_df = pd.read_csv("datasets_228_482_diabetes.csv")
+    questionable_columns = ["BloodPressure", "Glucose", "SkinThickness", "Insulin", "BMI"]
+    pima_df[questionable_columns] = pima_df[questionable_columns].replace(0, np.nan)
+
+    strategies = {
+        "IterativeImputer(RandomForestRegressor())": IterativeImputer(estimator=RandomForestRegressor(), random_state=42),
+        "ForestImputer": ForestImputer(random_state=42),
+        "ForestImputer(max_samples=0.5)": ForestImputer(max_samples=0.5, random_state=42),
+        "ForestImputer(time_budget=5)": ForestImputer(time_budget=5, random_state=42),
+    }
+    print(run_benchmark(pima_df, strategies, fraction=0.1, repeats=1, processes=1).round(3).to_string())
+
+    rounds = ForestImputer(random_state=42).fit(pima_df)
+    print(f"ForestImputer stopped after {rounds.n_iter_} rounds, changes: {np.round(rounds.changes_, 4)}")
@@ -0,0 +1,265 @@
+# %%
+# One function to read CSV, JSON, YAML and Parquet files into a DataFrame.
+# accessing_different_file_types_with_pandas.py uses a different call for
+# each format: pd.read_csv, pd.read_json, pd.json_normalize on the
+# 'Employees' column of a frame of dicts, and yaml.safe_load followed by
+# pd.DataFrame(animals['Animals']). read_any(path) picks the reader from the
+# file extension (or the first bytes of the file) and uses the fastest
+# backend that is installed:
+#   - CSV: pyarrow.csv (multi-threaded), else pd.read_csv
+#   - JSON / JSON lines: orjson, else the json module
+#   - YAML: the libyaml CSafeLoader, else the pure Python SafeLoader
+# Nested records are flattened straight into columns ("a.b" keys, like
+# json_normalize) without building a frame of dicts first, and a parsed file
+# is cached until its modification time changes.
+import json
+import os
+from collections import OrderedDict
+
+import pandas as pd
+import yaml
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:
+    pa_csv = None
+
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+EXTENSIONS = {
+    ".csv": "csv", ".tsv": "csv", ".data": "csv", ".txt": "csv",
+    ".json": "json", ".jsonl": "jsonl", ".ndjson": "jsonl",
+    ".yaml": "yaml", ".yml": "yaml",
+    ".parquet": "parquet", ".feather": "feather", ".arrow": "feather",
+}
+# read_csv defaults of CSV-like extensions: .tsv is tab separated and .data (as in imports-85.data, from the
+# UCI repository) has no header row
+CSV_DEFAULTS = {".tsv": {"delimiter": "\t"}, ".data": {"header": None}}
+CACHE_SIZE = 32
+
+_cache = OrderedDict()
+
+
+def read_any(path, record_path=None, sep=".", cache=True, **read_kwargs):
+    """Read the file at path into a DataFrame, whatever its format.
+
+    For JSON and YAML, record_path is the key (or list of keys) leading to
+    the list of records, e.g. "Employees" for employees_2.json. If it isn't
+    given, a top-level list is used, or else the first list under a key of
+    the top-level object (the same rule as json_stream.iter_records). Nested
+    keys become columns joined with sep; a mapping without any list (a config
+    file, say) is one record. Other keyword arguments go to the CSV reader
+    (pd.read_csv is used if there are any besides index_col, delimiter and
+    header). .tsv files are read tab separated and .data files without a
+    header row, unless delimiter= / header= say otherwise. The pyarrow
+    reader gives the same dtypes as pd.read_csv for plain files: dates stay
+    strings, empty columns are float64 NaN and "NA" is missing in text
+    columns too. With cache=True the result is kept until the file changes;
+    a copy is returned each time.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, _freeze(record_path), sep, _freeze(read_kwargs))
+    if cache and key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key].copy()
+
+    extension = os.path.splitext(path)[1].lower()
+    kind = EXTENSIONS.get(extension) or _sniff(path)
+    if kind == "csv":
+        df = _read_csv(path, **{**CSV_DEFAULTS.get(extension, {}), **read_kwargs})
+    elif kind in ("json", "jsonl", "yaml"):
+        df = records_to_frame(_load_document(path, kind), record_path, sep)
+    elif kind == "parquet":
+        df = pd.read_parquet(path, **read_kwargs)
+    else:
+        df = pd.read_feather(path, **read_kwargs)
+
+    if cache:
+        _cache[key] = df
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+        return df.copy()
+    return df
+
+
+def records_to_frame(document, record_path=None, sep="."):
+    """Build a DataFrame from parsed JSON / YAML, flattening nested records into columns."""
+    records = _find_records(document, record_path)
+    if isinstance(records, dict):
+        if all(isinstance(value, dict) for value in records.values()):
+            # Column-oriented, as written by DataFrame.to_json(): {column: {index: value}}
+            return pd.DataFrame(records)
+        # A mapping of settings rather than of columns: one row
+        records = [records]
+    elif not isinstance(records, list):
+        raise ValueError(f"expected a list or mapping of records, found {type(records).__name__}")
+    columns = {}
+    for row, record in enumerate(records):
+        for name, value in _flatten(record, sep):
+            column = columns.get(name)
+            if column is None:
+                # A key seen for the first time: earlier rows didn't have it
+                column = columns[name] = [None] * row
+            column.append(value)
+        for column in columns.values():
+            if len(column) <= row:
+                column.append(None)
+    return pd.DataFrame(columns)
+
+
+def clear_cache():
+    _cache.clear()
+
+
+def _read_csv(path, **read_kwargs):
+    # pyarrow infers dates / timestamps and a null type for empty columns where pd.read_csv gives
+    # strings and float64 NaN, so those columns are read again as strings / cast to float64
+    index_col = read_kwargs.pop("index_col", None)
+    delimiter = read_kwargs.pop("delimiter", ",")
+    header = read_kwargs.pop("header", "infer")
+    if pa_csv is None or read_kwargs or header not in ("infer", 0, None) or len(delimiter) != 1:
+        return pd.read_csv(path, index_col=index_col, delimiter=delimiter, header=header, **read_kwargs)
+    read_options = pa_csv.ReadOptions(autogenerate_column_names=header is None)
+    parse_options = pa_csv.ParseOptions(delimiter=delimiter)
+    # Text such as "NA" is missing in text columns too, as in pd.read_csv
+    table = pa_csv.read_csv(path, read_options, parse_options, pa_csv.ConvertOptions(strings_can_be_null=True))
+    temporal = [field.name for field in table.schema if pa.types.is_temporal(field.type)]
+    if temporal:
+        options = pa_csv.ConvertOptions(strings_can_be_null=True,
+                                        column_types={name: pa.string() for name in temporal})
+        table = pa_csv.read_csv(path, read_options, parse_options, options)
+    table = table.cast(pa.schema([field.with_type(pa.float64()) if pa.types.is_null(field.type) else field
+                                  for field in table.schema]))
+    df = table.to_pandas()
+    if header is None:
+        # Numbered columns, as pd.read_csv(header=None) gives
+        df.columns = pd.RangeIndex(len(df.columns))
+    return df.set_index(index_col) if index_col is not None else df
+
+
+def _load_document(path, kind):
+    if kind == "yaml":
+        with open(path, "rb") as f:
+            return yaml.load(f, Loader=YAML_LOADER)
+    with open(path, "rb") as f:
+        data = f.read()
+    loads = orjson.loads if orjson is not None else json.loads
+    if kind == "jsonl":
+        return [loads(line) for line in data.splitlines() if line.strip()]
+    return loads(data)
+
+
+def _find_records(document, record_path):
+    if record_path is not None:
+        for key in [record_path] if isinstance(record_path, str) else record_path:
+            document = document[key]
+        return document
+    if isinstance(document, dict):
+        # The first list under a key, as json_stream finds it while streaming; otherwise the
+        # document is taken to be column-oriented
+        return next((value for value in document.values() if isinstance(value, list)), document)
+    return document
+
+
+def _flatten(record, sep, prefix=""):
+    # (column name, value) pairs of a record, with nested dicts joined into "parent.child" names
+    if not isinstance(record, dict):
+        yield prefix or "0", record
+        return
+    for key, value in record.items():
+        name = f"{prefix}{sep}{key}" if prefix else str(key)
+        if isinstance(value, dict) and value:
+            yield from _flatten(value, sep, name)
+        else:
+            yield name, value
+
+
+def _sniff(path):
+    with open(path, "rb") as f:
+        start = f.read(2048).lstrip()
+    if start[:1] in (b"{", b"["):
+        return "jsonl" if start[:1] == b"{" and b"}\n{" in start.replace(b"\r", b"") else "json"
+    first_line = start.split(b"\n", 1)[0]
+    if first_line.startswith(b"---") or (b":" in first_line and b"," not in first_line):
+        return "yaml"
+    return "csv"
+
+
+def _freeze(value):
+    # Hashable version of keyword arguments for the cache key
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+# %%
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    print(read_any("Salaries.csv", index_col="Id").head())
+    print(read_any("employees.json").head())
+    print(read_any("employees_2.json", record_path="Employees").head())
+    print(read_any("animals.yaml").head())
+    print(read_any("sample.json"))
+
+    pd.testing.assert_frame_equal(read_any("employees_2.json"), pd.json_normalize(pd.read_json("employees_2.json")["Employees"]))
+    pd.testing.assert_frame_equal(read_any("Salaries.csv", index_col="Id"), pd.read_csv("Salaries.csv", index_col="Id"))
+    # .data files have no header row
+    pd.testing.assert_frame_equal(read_any("imports-85.data"), pd.read_csv("imports-85.data", header=None))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # A .tsv file is tab separated
+        tsv_path = os.path.join(tmp, "sample.tsv")
+        pd.read_csv("sample.csv").to_csv(tsv_path, sep="\t", index=False)
+        pd.testing.assert_frame_equal(read_any(tsv_path), pd.read_csv("sample.csv"))
+        # A mapping of settings (no list of records in it) is one row
+        config_path = os.path.join(tmp, "config.yaml")
+        with open(config_path, "w") as f:
+            f.write("name: pima\nrows: 768\nsource:\n  url: https://www.kaggle.com\n")
+        assert read_any(config_path).to_dict("records") == [{"name": "pima", "rows": 768,
+                                                             "source.url": "https://www.kaggle.com"}]
+
+    # Bigger files, each read the notebook's way and with read_any
+    with tempfile.TemporaryDirectory() as tmp:
+        n_records = 200_000
+        employees = [{"userId": i, "jobTitle": "Developer", "name": {"first": f"Albin{i}", "last": "Bailey"},
+                      "address": {"region": "CA", "city": {"name": "LA", "zip": f"{i % 99999:05d}"}}}
+                     for i in range(n_records)]
+        json_path = os.path.join(tmp, "employees_big.json")
+        with open(json_path, "w") as f:
+            json.dump({"Data": "Employees", "Employees": employees}, f)
+        yaml_path = os.path.join(tmp, "animals_big.yaml")
+        with open(yaml_path, "w") as f:
+            yaml.dump({"Animals": [{"name": f"Fifi{i}", "species": "Koala"} for i in range(20_000)]}, f,
+                      Dumper=getattr(yaml, "CDumper", yaml.Dumper))
+        csv_path = os.path.join(tmp, "salaries_big.csv")
+        pd.concat([pd.read_csv("Salaries.csv")] * 10).to_csv(csv_path, index=False)
+
+        timings = {
+            "CSV": (lambda: pd.read_csv(csv_path), lambda: read_any(csv_path, cache=False)),
+            "nested JSON": (lambda: pd.json_normalize(pd.read_json(json_path)["Employees"]),
+                            lambda: read_any(json_path, cache=False)),
+            "YAML": (lambda: pd.DataFrame(yaml.safe_load(open(yaml_path))["Animals"]),
+                     lambda: read_any(yaml_path, cache=False)),
+        }
+        for name, (notebook_way, fast_way) in timings.items():
+            tic = time.perf_counter()
+            notebook_way()
+            notebook_time = time.perf_counter() - tic
+            tic = time.perf_counter()
+            fast_way()
+            fast_time = time.perf_counter() - tic
+            print(f"{name:<12} notebook: {notebook_time:.2f}s, read_any: {fast_time:.2f}s")
+
+        read_any(json_path)
+        tic = time.perf_counter()
+        read_any(json_path)
+        print(f"nested JSON again (cached): {time.perf_counter() - tic:.3f}s")
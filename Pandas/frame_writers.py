@@ -0,0 +1,216 @@
+# %%
+# Writing a DataFrame to CSV, JSON lines and YAML a chunk at a time.
+# accessing_different_file_types_with_pandas.py writes sample_df with
+# to_csv, then to_json, then builds sample_df.to_dict() and passes it to
+# yaml.dump - three passes, each holding the whole serialised frame (or a
+# dict of every value) in memory, and yaml.dump with the pure Python dumper.
+# The writers here take the frame in chunks (a DataFrame split into
+# chunksize rows, or any iterable of frames such as read_csv(chunksize=...))
+# and append each chunk to the open file:
+#   - CSV with to_csv, the header only once
+#   - JSON lines with to_json(orient="records", lines=True)
+#   - YAML as a list of records, with the libyaml C dumper (CSafeDumper);
+#     the "- " items of each chunk simply continue the list
+# Files ending in .gz are gzip compressed and .zst zstd compressed (if the
+# zstandard package is installed). write_formats writes any of the three
+# formats from one pass over the chunks.
+import gzip
+import io
+import json
+
+import pandas as pd
+import yaml
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".zst": "zstd"}
+
+
+def open_output(path, compression="infer", level=None):
+    """Open path for writing text, compressed with "gzip", "zstd" or None ("infer" goes by the suffix)."""
+    if compression == "infer":
+        compression = next((name for suffix, name in COMPRESSION_SUFFIXES.items() if str(path).endswith(suffix)), None)
+    if compression is None:
+        return open(path, "w", encoding="utf-8", newline="")
+    if compression == "gzip":
+        return gzip.open(path, "wt", compresslevel=6 if level is None else level, encoding="utf-8", newline="")
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError("zstd compression needs the zstandard package")
+        compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+        return io.TextIOWrapper(compressor.stream_writer(open(path, "wb")), encoding="utf-8", newline="")
+    raise ValueError(f"unknown compression {compression!r}")
+
+
+class _FrameWriter:
+    # An open output file that chunks of a frame are appended to
+    def __init__(self, path, compression="infer", level=None):
+        self.path = path
+        self.rows = 0
+        self._file = open_output(path, compression, level)
+
+    def write(self, chunk):
+        self._write(chunk)
+        self.rows += len(chunk)
+        return self
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CSVWriter(_FrameWriter):
+    """CSV written chunk by chunk; to_csv_kwargs (default index=False) go to DataFrame.to_csv."""
+
+    def __init__(self, path, compression="infer", level=None, **to_csv_kwargs):
+        super().__init__(path, compression, level)
+        self.to_csv_kwargs = {"index": False, **to_csv_kwargs}
+
+    def _write(self, chunk):
+        chunk.to_csv(self._file, header=self.rows == 0, **self.to_csv_kwargs)
+
+
+class JSONLinesWriter(_FrameWriter):
+    """One JSON record per row, dates in ISO format."""
+
+    def _write(self, chunk):
+        if len(chunk):
+            self._file.write(chunk.to_json(orient="records", lines=True, date_format="iso"))
+
+
+class YAMLWriter(_FrameWriter):
+    """A YAML list of records, optionally under a top-level key (like "Animals" in animals.yaml).
+
+    Missing values are written as null and dates as strings, so the file
+    loads with yaml.safe_load. Without any rows the list is written as [].
+    """
+
+    def __init__(self, path, key=None, compression="infer", level=None):
+        super().__init__(path, compression, level)
+        self._key = None if key is None else json.dumps(str(key))
+
+    def _write(self, chunk):
+        if len(chunk):
+            if self.rows == 0 and self._key is not None:
+                self._file.write(f"{self._key}:\n")
+            yaml.dump(_records(chunk), self._file, Dumper=YAML_DUMPER, sort_keys=False, allow_unicode=True)
+
+    def close(self):
+        if self.rows == 0 and not self._file.closed:
+            self._file.write("[]\n" if self._key is None else f"{self._key}: []\n")
+        super().close()
+
+
+def write_formats(data, csv_path=None, jsonl_path=None, yaml_path=None, chunksize=100_000, compression="infer",
+                  yaml_key=None):
+    """Write data to any of CSV, JSON lines and YAML in one pass over its chunks.
+
+    data is a DataFrame (written chunksize rows at a time) or an iterable of
+    DataFrames. Returns the number of rows written.
+    """
+    writers = []
+    try:
+        if csv_path is not None:
+            writers.append(CSVWriter(csv_path, compression))
+        if jsonl_path is not None:
+            writers.append(JSONLinesWriter(jsonl_path, compression))
+        if yaml_path is not None:
+            writers.append(YAMLWriter(yaml_path, yaml_key, compression))
+        rows = 0
+        for chunk in _chunks(data, chunksize):
+            for writer in writers:
+                writer.write(chunk)
+            rows += len(chunk)
+    finally:
+        for writer in writers:
+            writer.close()
+    return rows
+
+
+def _chunks(data, chunksize):
+    if isinstance(data, pd.DataFrame):
+        return (data.iloc[i:i + chunksize] for i in range(0, max(len(data), 1), chunksize))
+    return data
+
+
+def _records(chunk):
+    # Rows as dicts of plain Python values (None for missing values, dates as strings)
+    columns = []
+    for col in chunk.columns:
+        values = chunk[col]
+        missing = values.isna().to_numpy()
+        if values.dtype.kind in "mM":
+            values = values.astype(str)
+        values = values.tolist()
+        if missing.any():
+            values = [None if is_missing else value for value, is_missing in zip(values, missing)]
+        columns.append(values)
+    names = [str(col) for col in chunk.columns]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+# %%
+if __name__ == "__main__":
+    import os
+    import tempfile
+    import time
+    import tracemalloc
+
+    import numpy as np
+
+    sample_df = pd.DataFrame({'column_1': [1, 2, 3, 4, 5], 'column_2': [6, 7, 8, 9, 10], 'column_3': [11, 12, 13, 14, 15]})
+    with tempfile.TemporaryDirectory() as tmp:
+        write_formats(sample_df, os.path.join(tmp, "sample.csv"), os.path.join(tmp, "sample.jsonl"),
+                      os.path.join(tmp, "sample.yaml"), chunksize=2)
+        with open(os.path.join(tmp, "sample.yaml")) as f:
+            print(f.read())
+        pd.testing.assert_frame_equal(pd.read_csv(os.path.join(tmp, "sample.csv")), sample_df)
+        pd.testing.assert_frame_equal(pd.read_json(os.path.join(tmp, "sample.jsonl"), lines=True), sample_df)
+
+    rng = np.random.default_rng(0)
+    n_rows = 100_000
+    big_df = pd.DataFrame({
+        "Id": np.arange(n_rows),
+        "EmployeeName": rng.choice(["NATHANIEL FORD", "GARY JIMENEZ", "ALBERT PARDINI", None], n_rows),
+        "BasePay": rng.normal(100_000, 20_000, n_rows).round(2),
+        "Year": rng.integers(2011, 2015, n_rows),
+        "Date": pd.Timestamp("2011-01-01") + pd.to_timedelta(rng.integers(0, 1_460, n_rows), unit="D"),
+    })
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def notebook_way():
+            # The notebook's three separate writes, with records for YAML so it can be read back as rows
+            big_df.to_csv(os.path.join(tmp, "old.csv.gz"), index=False)
+            big_df.to_json(os.path.join(tmp, "old.jsonl.gz"), orient="records", lines=True, date_format="iso")
+            with gzip.open(os.path.join(tmp, "old.yaml.gz"), "wt") as f:
+                yaml.safe_dump(_records(big_df), f, sort_keys=False)
+
+        def single_pass():
+            write_formats(big_df, os.path.join(tmp, "new.csv.gz"), os.path.join(tmp, "new.jsonl.gz"),
+                          os.path.join(tmp, "new.yaml.gz"), chunksize=20_000)
+
+        results = {}
+        for name, run in {"to_csv + to_json + yaml.safe_dump": notebook_way, "write_formats": single_pass}.items():
+            tic = time.perf_counter()
+            run()
+            run_time = time.perf_counter() - tic
+            tracemalloc.start()
+            run()
+            results[name] = (run_time, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+        pd.testing.assert_frame_equal(pd.read_csv(os.path.join(tmp, "new.csv.gz")),
+                                      pd.read_csv(os.path.join(tmp, "old.csv.gz")))
+        with gzip.open(os.path.join(tmp, "new.yaml.gz"), "rt") as f:
+            assert yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader)) == _records(big_df)
+    for name, (run_time, peak) in results.items():
+        print(f"{name:<34} {run_time:.2f}s, peak {peak / 2**20:.0f} MiB")
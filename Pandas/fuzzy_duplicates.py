@@ -0,0 +1,224 @@
+# %%
+# Fuzzy duplicate detection that scales to millions of records.
+# data_cleaning.py only shows drop_duplicates() for exact copies and points at
+# fuzzywuzzy for near-duplicates such as the fuzzy_duplicates_df example, but
+# comparing every pair of records is quadratic. Instead, candidate pairs come from:
+#   - blocking keys (e.g. normalised name, phone): records are sorted by key and
+#     each is compared with the next few records that share its key
+#     (sorted neighbourhood), so a big block never blows up into all its pairs
+#   - MinHash / LSH on a free-text column (e.g. email): records whose signatures
+#     agree on a whole band land in the same bucket, again with a window
+# Each candidate pair is scored column by column (exact match of the normalised
+# value, or the MinHash estimate of the Jaccard similarity for the LSH column),
+# pairs above a threshold are linked and the linked groups become cluster IDs.
+import time
+
+import numpy as np
+import pandas as pd
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_UINT64 = np.iinfo(np.uint64).max
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def normalize_text(series):
+    """Lower case and keep letters and digits only, so 'Alice@Email.com' == 'alice@email.com'."""
+    return series.astype("string").str.lower().str.replace(r"[^0-9a-z]", "", regex=True).replace("", pd.NA)
+
+
+def minhash_signatures(texts, num_perm=32, shingle_size=3, seed=0, max_length=64, chunk_rows=100_000):
+    """MinHash signature (num_perm uint64 values) of the character shingles of each text.
+
+    texts should be normalised (see normalize_text) ASCII strings; only the
+    first max_length characters are used. Returns an (n, num_perm) array;
+    rows for missing texts are all max-uint64. The fraction of equal positions
+    in two signatures estimates the Jaccard similarity of their shingle sets.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 32, num_perm, dtype=np.uint64)
+    b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64)
+    texts = pd.Series(texts, dtype=object)
+    signatures = np.full((len(texts), num_perm), _MAX_UINT64, dtype=np.uint64)
+
+    for start in range(0, len(texts), chunk_rows):
+        chunk = texts.iloc[start:start + chunk_rows]
+        lengths = chunk.str.len().fillna(0).to_numpy(dtype=np.int64).clip(0, max_length)
+        width = max(int(lengths.max(initial=0)), shingle_size)
+        # Fixed-width bytes give an (n, width) grid of characters to build the shingles from
+        chars = chunk.fillna("").to_numpy(dtype=f"S{width}").view(np.uint8).reshape(len(chunk), width)
+        n_positions = width - shingle_size + 1
+        shingles = np.zeros((len(chunk), n_positions), dtype=np.uint64)
+        for offset in range(shingle_size):
+            shingles = (shingles << np.uint64(8)) | chars[:, offset:offset + n_positions].astype(np.uint64)
+        with np.errstate(over="ignore"):
+            shingles = (shingles * _MIX) >> np.uint64(32)
+        # A text shorter than a shingle still gets one (zero padded) shingle
+        valid = np.arange(n_positions) <= np.maximum(lengths - shingle_size, 0)[:, None]
+        valid &= (lengths > 0)[:, None]
+
+        for i in range(num_perm):
+            permuted = (shingles * a[i] + b[i]) % _MERSENNE_PRIME
+            permuted[~valid] = _MAX_UINT64
+            signatures[start:start + len(chunk), i] = permuted.min(axis=1)
+    return signatures
+
+
+def find_duplicates(df, block_on=None, lsh_on=None, compare=None, weights=None, threshold=0.6,
+                    window=10, num_perm=32, bands=8, shingle_size=3):
+    """Return a cluster ID for every row of df; rows with the same ID are fuzzy duplicates.
+
+    block_on is a list of column lists used as blocking keys, e.g.
+    [["First_Name", "Last_Name"], ["Phone"]]. lsh_on is a text column for
+    MinHash/LSH candidates. compare lists the columns used to score a
+    candidate pair (all of them by default) and weights their importance.
+    A pair is a duplicate if its weighted score is at least threshold.
+    """
+    n = len(df)
+    block_on = block_on or []
+    compare = list(compare or df.columns)
+    weights = np.ones(len(compare)) if weights is None else np.asarray([weights[c] for c in compare], dtype=float)
+
+    normalized = {c: normalize_text(df[c]) if not pd.api.types.is_numeric_dtype(df[c]) else df[c]
+                  for c in set(compare) | {c for cols in block_on for c in cols} | ({lsh_on} - {None})}
+    codes = {c: pd.factorize(values, sort=True)[0] for c, values in normalized.items()}
+
+    # Order records inside a block by the LSH text (or the first compared column) so similar ones are neighbours
+    order_key = codes[lsh_on if lsh_on is not None else compare[0]]
+    pairs = []
+    for cols in block_on:
+        keys = pd.DataFrame({c: normalized[c] for c in cols}).groupby(cols, dropna=True, sort=False).ngroup().to_numpy()
+        pairs.append(_neighbour_pairs(keys, order_key, window))
+
+    signatures = None
+    if lsh_on is not None:
+        # Only the distinct texts need a signature
+        text_codes, distinct_texts = pd.factorize(normalized[lsh_on])
+        signatures = minhash_signatures(distinct_texts, num_perm, shingle_size)
+        signatures = np.vstack([signatures, np.full((1, num_perm), _MAX_UINT64, dtype=np.uint64)])[text_codes]
+        has_text = codes[lsh_on] >= 0
+        rows_per_band = num_perm // bands
+        for band in range(bands):
+            band_hash = _hash_rows(signatures[:, band * rows_per_band:(band + 1) * rows_per_band])
+            keys = np.where(has_text, pd.factorize(band_hash)[0], -1)
+            pairs.append(_neighbour_pairs(keys, order_key, window))
+
+    left, right = _unique_pairs(pairs, n)
+    score = np.zeros(len(left))
+    for weight, c in zip(weights, compare):
+        if c == lsh_on:
+            similarity = _signature_similarity(signatures, left, right)
+        else:
+            similarity = (codes[c][left] == codes[c][right]) & (codes[c][left] >= 0)
+        score += weight * similarity
+    score /= weights.sum()
+
+    keep = score >= threshold
+    labels = _connected_components(n, left[keep], right[keep])
+    return pd.Series(pd.factorize(labels)[0], index=df.index, name="cluster_id")
+
+
+def drop_fuzzy_duplicates(df, **kwargs):
+    """Keep the first row of every cluster found by find_duplicates."""
+    clusters = find_duplicates(df, **kwargs)
+    return df[~clusters.duplicated().to_numpy()]
+
+
+def _neighbour_pairs(keys, order_key, window):
+    # Pairs of rows with the same key that are at most window apart once sorted by (key, order_key)
+    rows = np.flatnonzero(keys >= 0)
+    rows = rows[np.lexsort((order_key[rows], keys[rows]))]
+    sorted_keys = keys[rows]
+    left, right = [], []
+    for offset in range(1, window + 1):
+        same = sorted_keys[:-offset] == sorted_keys[offset:]
+        left.append(rows[:-offset][same])
+        right.append(rows[offset:][same])
+    return np.concatenate(left or [[]]).astype(np.int64), np.concatenate(right or [[]]).astype(np.int64)
+
+
+def _unique_pairs(pairs, n):
+    if not pairs:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    left = np.concatenate([p[0] for p in pairs])
+    right = np.concatenate([p[1] for p in pairs])
+    low, high = np.minimum(left, right), np.maximum(left, right)
+    combined = np.sort(low * n + high)
+    if len(combined):
+        combined = combined[np.r_[True, combined[1:] != combined[:-1]]]
+    return combined // n, combined % n
+
+
+def _hash_rows(block):
+    # Combine the columns of each row into a single uint64 (wrapping arithmetic is intended)
+    h = np.zeros(len(block), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for col in block.T:
+            h = h * np.uint64(1_000_003) ^ col
+    return h
+
+
+def _signature_similarity(signatures, left, right, chunk=1_000_000):
+    similarity = np.empty(len(left))
+    for start in range(0, len(left), chunk):
+        end = start + chunk
+        similarity[start:end] = (signatures[left[start:end]] == signatures[right[start:end]]).mean(axis=1)
+    return similarity
+
+
+def _connected_components(n, left, right):
+    # Min-label propagation with pointer jumping: every node ends up labelled
+    # with the smallest row number in its group of linked rows
+    labels = np.arange(n)
+    while True:
+        smallest = np.minimum(labels[left], labels[right])
+        new = labels.copy()
+        np.minimum.at(new, left, smallest)
+        np.minimum.at(new, right, smallest)
+        new = new[new]
+        if np.array_equal(new, labels):
+            return labels
+        labels = new
+
+
+def _synthetic_customers(n_people, copies=3, seed=0):
+    # People with a few noisy copies each (typos in the email, different case, missing phone)
+    rng = np.random.default_rng(seed)
+    first = np.array(["alice", "bob", "carlos", "diana", "ephraim", "frank", "gina", "hank", "ivy", "jack"])
+    people = pd.DataFrame({
+        "First_Name": first[rng.integers(0, len(first), n_people)],
+        "Last_Name": [f"surname{i}" for i in rng.integers(0, n_people, n_people)],
+        "Phone": [f"07{i:09d}" for i in rng.integers(0, 10**9, n_people)],
+        "person": np.arange(n_people),
+    })
+    people["Email"] = people["First_Name"] + people["person"].astype(str) + "@example.com"
+    records = people.loc[np.repeat(people.index, copies)].reset_index(drop=True)
+    noisy = rng.random(len(records)) < 0.5
+    records.loc[noisy, "Email"] = records.loc[noisy, "Email"].str.replace("example", "exmaple")
+    records.loc[rng.random(len(records)) < 0.3, "First_Name"] = records["First_Name"].str.upper()
+    records.loc[rng.random(len(records)) < 0.2, "Phone"] = None
+    return records.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+# %%
+if __name__ == "__main__":
+    fuzzy_duplicates_df = pd.DataFrame({
+        'First_Name': ['Alice', 'Alice', 'Alice', 'Alice'],
+        'Last_Name': ['Smith', 'Smith', 'Smith', 'Smith'],
+        'Age': [28, 34, 45, 45],
+        'Phone': ['123-456', '456-789', '123-456', '123-456'],
+        'Email': ['alice@email.com', 'alice@smith.com', 'alice@theinternet.com', 'Alice@theinternet.com']
+    })
+    fuzzy_duplicates_df["cluster_id"] = find_duplicates(
+        fuzzy_duplicates_df, block_on=[["First_Name", "Last_Name"], ["Phone"]], lsh_on="Email")
+    print(fuzzy_duplicates_df)
+
+    for n_people in [100_000, 400_000]:
+        customers = _synthetic_customers(n_people)
+        tic = time.perf_counter()
+        clusters = find_duplicates(customers, block_on=[["First_Name", "Last_Name"], ["Phone"]], lsh_on="Email",
+                                   compare=["First_Name", "Last_Name", "Phone", "Email"], threshold=0.6)
+        elapsed = time.perf_counter() - tic
+        # How well do the clusters match the real people?
+        pure = clusters.groupby(customers["person"]).nunique().eq(1).mean()
+        print(f"{len(customers):,} records: {elapsed:.1f}s, {clusters.nunique():,} clusters, "
+              f"{pure:.1%} of people in a single cluster")
@@ -0,0 +1,116 @@
+# %%
+# Measuring imputation strategies against each other.
+# missing_values.py runs the mean / median / mode SimpleImputers, KNNImputer
+# and the two IterativeImputers on pima_df one after the other and compares
+# them by eye on scatter plots. Here some of the values we do know are hidden,
+# every strategy fills them in (all at the same time, in a process pool) and
+# is scored on how close it gets to the real values, along with how long it
+# took and how much memory it needed. That gives the cost against accuracy
+# numbers to pick an imputer for production with.
+import os
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.experimental import enable_iterative_imputer  # noqa: F401
+from sklearn.impute import IterativeImputer, KNNImputer, SimpleImputer
+
+from forest_imputation import ForestImputer
+from knn_imputation import knn_impute
+
+# The imputers from missing_values.py (plus knn_impute and ForestImputer). A strategy is either
+# an sklearn-style imputer (cloned and fit_transform-ed) or a function taking
+# the frame with gaps and returning it filled. Both must be picklable.
+STRATEGIES = {
+    "mean": SimpleImputer(strategy="mean"),
+    "median": SimpleImputer(strategy="median"),
+    "most_frequent": SimpleImputer(strategy="most_frequent"),
+    "knn": KNNImputer(n_neighbors=3, weights="distance"),
+    "knn_impute": partial(knn_impute, n_neighbors=3, weights="distance"),
+    "bayesian_ridge": IterativeImputer(sample_posterior=True, random_state=42),
+    "random_forest": IterativeImputer(estimator=RandomForestRegressor(), random_state=42),
+    "forest_imputer": ForestImputer(random_state=42),
+}
+
+
+def mask_known_values(df, fraction=0.1, columns=None, seed=0):
+    """Hide a fraction of the known values of columns (all numeric columns by default).
+
+    Returns the frame with the extra NaNs and a boolean frame marking the hidden values.
+    """
+    columns = list(df.select_dtypes("number").columns) if columns is None else list(columns)
+    rng = np.random.default_rng(seed)
+    hidden = pd.DataFrame(False, index=df.index, columns=df.columns)
+    hidden[columns] = df[columns].notna().to_numpy() & (rng.random((len(df), len(columns))) < fraction)
+    return df.mask(hidden), hidden
+
+
+def score_imputation(truth, imputed, hidden):
+    """Errors on the hidden values: RMSE, MAE and RMSE in units of each column's standard deviation."""
+    columns = hidden.columns[hidden.any()]
+    errors = (pd.DataFrame(imputed, index=truth.index, columns=truth.columns)[columns] - truth[columns])
+    errors = errors.where(hidden[columns])
+    squared = (errors ** 2).stack()
+    normalized = ((errors / truth[columns].std()) ** 2).stack()
+    return {
+        "rmse": float(np.sqrt(squared.mean())),
+        "mae": float(errors.abs().stack().mean()),
+        "nrmse": float(np.sqrt(normalized.mean())),
+    }
+
+
+def run_benchmark(df, strategies=STRATEGIES, fraction=0.1, repeats=1, processes=None, seed=0):
+    """Hide values of df, fill them with every strategy and score the results.
+
+    Each of the repeats hides a different random set of values. Strategies run
+    concurrently in a process pool (one process per CPU by default), or one
+    after the other with processes=1. With more processes than CPUs the wall
+    times include waiting for a CPU; cpu_seconds does not. Returns a DataFrame
+    with one row per strategy: wall and CPU seconds, peak memory (MiB, from
+    tracemalloc) and the errors of score_imputation, averaged over the
+    repeats, most accurate first.
+    """
+    numeric = df.select_dtypes("number")
+    tasks = []
+    for repeat in range(repeats):
+        masked, hidden = mask_known_values(numeric, fraction, seed=seed + repeat)
+        tasks += [(name, strategy, numeric, masked, hidden) for name, strategy in strategies.items()]
+
+    processes = processes or os.cpu_count()
+    if processes > 1:
+        with ProcessPoolExecutor(processes) as pool:
+            results = list(pool.map(_run_strategy, tasks))
+    else:
+        results = [_run_strategy(task) for task in tasks]
+    return pd.DataFrame(results).groupby("strategy", sort=False).mean().sort_values("nrmse")
+
+
+def _run_strategy(task):
+    name, strategy, truth, masked, hidden = task
+    tracemalloc.start()
+    wall, cpu = time.perf_counter(), time.process_time()
+    if hasattr(strategy, "fit_transform"):
+        imputed = clone(strategy).fit_transform(masked)
+    else:
+        imputed = strategy(masked)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"strategy": name, "seconds": wall, "cpu_seconds": cpu, "peak_mib": peak / 2**20,
+            **score_imputation(truth, np.asarray(imputed, dtype=np.float64), hidden)}
+
+
+# %%
+if __name__ == "__main__":
+    # pima_df with the impossible zeros turned into NaN, as in missing_values.py
+    pima_df = pd.read_csv("datasets_228_482_diabetes.csv")
+    questionable_columns = ["BloodPressure", "Glucose", "SkinThickness", "Insulin", "BMI"]
+    pima_df[questionable_columns] = pima_df[questionable_columns].replace(0, np.nan)
+
+    results = run_benchmark(pima_df, fraction=0.1, repeats=2)
+    print(results.round(3).to_string())
@@ -0,0 +1,141 @@
+# %%
+# Streaming aggregation over the Car_Insurance call dataset.
+# car_insurance_calls.py reads the whole CSV, copies it and then calls dropna(),
+# so the file is held in memory three times over. Here the CSV is read in
+# fixed-size chunks; each chunk is cleaned, its call durations are parsed and
+# only small per-group totals are kept. The totals from each chunk are merged,
+# so memory depends on the chunk size and not on the size of the file.
+import numpy as np
+import pandas as pd
+
+from call_durations import MISSING, call_durations, format_hms
+
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+FIRST_HALF = MONTHS[:6]
+
+
+def iter_call_chunks(path, chunksize=100_000, subset=None, **read_csv_kwargs):
+    """Yield cleaned chunks of the call dataset with an int32 Duration column.
+
+    Rows with missing values in subset (all columns by default, like dropna())
+    are dropped from each chunk before the durations are parsed.
+    """
+    read_csv_kwargs.setdefault("index_col", "Id")
+    for chunk in pd.read_csv(path, chunksize=chunksize, **read_csv_kwargs):
+        chunk = chunk.dropna(subset=subset)
+        chunk["Duration"] = call_durations(chunk["CallStart"].to_numpy(), chunk["CallEnd"].to_numpy())
+        yield chunk
+
+
+class CallAggregates:
+    """Running totals for the call dataset that can be updated one chunk at a time.
+
+    Everything is stored as sums and counts, so two CallAggregates built from
+    different parts of a file can be merged into the totals for the whole file.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.duration_sum = 0
+        self.duration_count = 0
+        self.duration_min = None
+        self.duration_max = None
+        self.numeric_sums = pd.Series(dtype="float64")
+        self.numeric_counts = pd.Series(dtype="int64")
+        self.job_stats = pd.DataFrame(columns=["calls", "duration_sum", "duration_count"], dtype="int64")
+        self.communication_by_month = pd.DataFrame(dtype="int64")
+
+    def update(self, chunk):
+        """Add the totals from one cleaned chunk (see iter_call_chunks)."""
+        self.rows += len(chunk)
+
+        durations = chunk["Duration"].to_numpy()
+        valid = durations[durations != MISSING]
+        if valid.size:
+            self.duration_sum += int(valid.sum(dtype=np.int64))
+            self.duration_count += int(valid.size)
+            self.duration_min = _combine(self.duration_min, int(valid.min()), min)
+            self.duration_max = _combine(self.duration_max, int(valid.max()), max)
+
+        numeric = chunk.select_dtypes(include=np.number).drop(columns="Duration")
+        self.numeric_sums = self.numeric_sums.add(numeric.sum(), fill_value=0)
+        self.numeric_counts = self.numeric_counts.add(numeric.count(), fill_value=0)
+
+        has_duration = chunk["Duration"] != MISSING
+        job_stats = pd.DataFrame({
+            "calls": chunk.groupby("Job").size(),
+            "duration_sum": chunk["Duration"].where(has_duration, 0).groupby(chunk["Job"]).sum(),
+            "duration_count": has_duration.groupby(chunk["Job"]).sum(),
+        })
+        self.job_stats = self.job_stats.add(job_stats, fill_value=0)
+
+        by_month = pd.crosstab(chunk["LastContactMonth"], chunk["Communication"])
+        self.communication_by_month = self.communication_by_month.add(by_month, fill_value=0)
+        return self
+
+    def merge(self, other):
+        """Fold the totals of another CallAggregates into this one."""
+        self.rows += other.rows
+        self.duration_sum += other.duration_sum
+        self.duration_count += other.duration_count
+        self.duration_min = _combine(self.duration_min, other.duration_min, min)
+        self.duration_max = _combine(self.duration_max, other.duration_max, max)
+        self.numeric_sums = self.numeric_sums.add(other.numeric_sums, fill_value=0)
+        self.numeric_counts = self.numeric_counts.add(other.numeric_counts, fill_value=0)
+        self.job_stats = self.job_stats.add(other.job_stats, fill_value=0)
+        self.communication_by_month = self.communication_by_month.add(other.communication_by_month, fill_value=0)
+        return self
+
+    def mean_duration(self):
+        """Mean call duration in seconds."""
+        if self.duration_count == 0:
+            return np.nan
+        return self.duration_sum / self.duration_count
+
+    def numeric_means(self):
+        """Mean of each numeric column, like select_dtypes(include=np.number).mean()."""
+        return self.numeric_sums / self.numeric_counts
+
+    def job_summary(self):
+        """Number of calls and mean duration (seconds) per Job, most common first."""
+        summary = self.job_stats.astype("int64")
+        summary["mean_duration"] = summary["duration_sum"] / summary["duration_count"]
+        return summary[["calls", "mean_duration"]].sort_values("calls", ascending=False)
+
+    def communication_counts(self, months=None):
+        """Number of calls per Communication channel, optionally for some months only."""
+        counts = self.communication_by_month
+        if months is not None:
+            counts = counts.reindex([m.lower() for m in months]).dropna(how="all")
+        return counts.sum().astype("int64").sort_values(ascending=False)
+
+    def most_common_communication(self, months=FIRST_HALF):
+        """Most common way of communication for the given months (Jan-June by default)."""
+        counts = self.communication_counts(months)
+        return counts.idxmax() if len(counts) else None
+
+
+def aggregate_calls(path, chunksize=100_000, subset=None, **read_csv_kwargs):
+    """Stream the CSV at path and return the merged CallAggregates."""
+    aggregates = CallAggregates()
+    for chunk in iter_call_chunks(path, chunksize=chunksize, subset=subset, **read_csv_kwargs):
+        aggregates.update(chunk)
+    return aggregates
+
+
+def _combine(current, new, pick):
+    if current is None:
+        return new
+    if new is None:
+        return current
+    return pick(current, new)
+
+
+# %%
+if __name__ == "__main__":
+    aggregates = aggregate_calls("Car_Insurance.csv", chunksize=500)
+    print("Rows kept:", aggregates.rows)
+    print("Mean call duration:", format_hms(aggregates.mean_duration()))
+    print(aggregates.numeric_means())
+    print(aggregates.job_summary())
+    print("Most common communication (Jan-June):", aggregates.most_common_communication())
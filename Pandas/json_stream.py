@@ -0,0 +1,248 @@
+# %%
+# Flattening large JSON exports a batch at a time.
+# accessing_different_file_types_with_pandas.py loads employees_2.json with
+# pd.read_json, which parses the whole document and keeps the records as a
+# column of Python dicts, and only then flattens them with
+# pd.json_normalize(df_json_2['Employees']) - so a big export sits in memory
+# twice. Here the file is read in buffered blocks and the records are decoded
+# one at a time with json.JSONDecoder.raw_decode (the C scanner of the json
+# module), walking into the enclosing object / array by hand. Records are
+# flattened ("name.first" columns, as json_normalize does) into DataFrames of
+# batch_size rows, which can be written straight to Parquet, so memory depends
+# on the batch size and not on the size of the file. Works for JSON arrays,
+# for a list of records under a key ({"Employees": [...]}) and for JSON lines.
+import json
+import os
+import re
+
+import pandas as pd
+
+from format_reader import records_to_frame
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class _BufferedJSON:
+    # A text file read in blocks, decoded one JSON value at a time
+    def __init__(self, f, buffer_size):
+        self.f = f
+        self.buffer_size = buffer_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def peek(self):
+        """The next character that isn't whitespace ("" at the end of the file)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._read_more():
+                return ""
+
+    def expect(self, characters):
+        found = self.peek()
+        if not found or found not in characters:
+            raise ValueError(f"expected one of {characters!r} at offset {self.pos} of the buffer, found {found!r}")
+        self.pos += 1
+        return found
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._read_more():
+                    continue  # the value runs past the end of the buffer
+                raise
+            if end == len(self.buf) and self._read_more():
+                continue  # a number at the end of the buffer may have more digits
+            self.pos = end
+            return value
+
+    def _read_more(self):
+        if self.eof:
+            return False
+        block = self.f.read(self.buffer_size)
+        if not block:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + block
+        self.pos = 0
+        return True
+
+
+def iter_records(path, record_path=None, lines=None, buffer_size=1 << 20):
+    """Yield the records of a JSON file one at a time.
+
+    record_path is the key (or list of keys) of the list of records in an
+    object, e.g. "Employees" for employees_2.json; by default the file's
+    top-level array is used, or else the first array under a key of the
+    top-level object (the same rule as format_reader.read_any). With lines=True the file is JSON lines (one record per
+    line); by default that's decided by a .jsonl / .ndjson extension.
+    """
+    if lines is None:
+        lines = os.path.splitext(path)[1].lower() in (".jsonl", ".ndjson")
+    keys = [] if record_path is None else [record_path] if isinstance(record_path, str) else list(record_path)
+    with open(path, encoding="utf-8") as f:
+        reader = _BufferedJSON(f, buffer_size)
+        if lines:
+            while reader.peek():
+                yield reader.value()
+        else:
+            yield from _stream_records(reader, keys, record_path is None)
+
+
+def iter_batches(path, batch_size=10_000, record_path=None, sep=".", columns=None, lines=None, buffer_size=1 << 20):
+    """Yield DataFrames of batch_size flattened records from a JSON file.
+
+    Every batch has the columns seen so far (None where a record has no
+    such key), or exactly the given columns.
+    """
+    seen = list(columns) if columns is not None else []
+    batch = []
+    for record in iter_records(path, record_path, lines, buffer_size):
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield _to_frame(batch, sep, seen, columns is None)
+            batch = []
+    if batch:
+        yield _to_frame(batch, sep, seen, columns is None)
+
+
+def json_to_parquet(path, parquet_path, batch_size=50_000, record_path=None, sep=".", columns=None, schema=None,
+                    lines=None, compression="snappy"):
+    """Flatten the records of a JSON file into a Parquet file, one row group per batch.
+
+    The Parquet schema is that of the first batch unless schema (a
+    pyarrow.Schema) is given; columns that are always null in the first
+    batch are stored as strings. Later batches are cast to the schema (so a
+    number in such a column is written as text); a batch that can't be cast
+    raises ValueError, and schema= should be passed instead. Returns the
+    number of rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    rows = 0
+    try:
+        for batch in iter_batches(path, batch_size, record_path, sep, columns, lines):
+            if writer is None:
+                if schema is None:
+                    schema = pa.Schema.from_pandas(batch, preserve_index=False)
+                    schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                                        for field in schema]).remove_metadata()
+                writer = pq.ParquetWriter(parquet_path, schema, compression=compression)
+            new_columns = [col for col in batch.columns if col not in schema.names]
+            if new_columns:
+                raise ValueError(f"columns {new_columns} first appear after row {rows}; pass columns= or schema=")
+            writer.write_table(_cast_batch(batch, schema, rows))
+            rows += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def _cast_batch(batch, schema, first_row):
+    # Arrow table of a batch with exactly the columns and types of schema
+    import pyarrow as pa
+
+    try:
+        table = pa.Table.from_pandas(batch, preserve_index=False)
+        for field in schema:
+            if field.name not in table.column_names:
+                table = table.append_column(field.name, pa.nulls(len(table), field.type))
+        return table.select(schema.names).cast(schema, safe=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as exc:
+        raise ValueError(f"rows {first_row}-{first_row + len(batch) - 1} don't fit the Parquet schema ({exc}); "
+                         "pass schema=") from exc
+
+
+def _stream_records(reader, keys, find_array):
+    start = reader.expect("[{")
+    if start == "[":
+        if keys:
+            raise KeyError(keys[0])
+        if reader.peek() == "]":
+            return
+        while True:
+            yield reader.value()
+            if reader.expect(",]") == "]":
+                return
+    if reader.peek() == "}":
+        raise KeyError(keys[0] if keys else "no list of records in the top-level object")
+    while True:
+        key = reader.value()
+        reader.expect(":")
+        if (keys and key == keys[0]) or (find_array and reader.peek() == "["):
+            yield from _stream_records(reader, keys[1:], False)
+            return
+        reader.value()  # skip the values of other keys ("Data", "Number of Employees", ...)
+        if reader.expect(",}") == "}":
+            raise KeyError(keys[0] if keys else "no list of records in the top-level object")
+
+
+def _to_frame(records, sep, seen, add_new):
+    frame = records_to_frame(records, sep=sep)
+    if add_new:
+        seen.extend(col for col in frame.columns if col not in seen)
+    return frame.reindex(columns=seen)
+
+
+# %%
+if __name__ == "__main__":
+    import tempfile
+    import time
+    import tracemalloc
+
+    for batch in iter_batches("employees_2.json", batch_size=2):
+        print(batch)
+    pd.testing.assert_frame_equal(pd.concat(iter_batches("employees_2.json"), ignore_index=True),
+                                  pd.json_normalize(pd.read_json("employees_2.json")["Employees"]))
+
+    # An export of 200,000 nested employee records, with a JSON lines copy
+    with tempfile.TemporaryDirectory() as tmp:
+        n_records = 200_000
+        employees = ({"userId": i, "jobTitle": "Developer", "name": {"first": f"Albin{i}", "last": "Bailey"},
+                      "address": {"region": "CA", "city": {"name": "LA", "zip": f"{i % 99999:05d}"}},
+                      "phoneNumber": str(1_000_000 + i)} for i in range(n_records))
+        json_path = os.path.join(tmp, "employees_big.json")
+        jsonl_path = os.path.join(tmp, "employees_big.jsonl")
+        with open(json_path, "w") as f, open(jsonl_path, "w") as f_lines:
+            f.write('{"Data": "Employees", "Number of Employees": %d, "Employees": [' % n_records)
+            for i, employee in enumerate(employees):
+                text = json.dumps(employee)
+                f.write(("," if i else "") + text)
+                f_lines.write(text + "\n")
+            f.write("]}")
+        print(f"{os.path.getsize(json_path) / 2**20:.0f} MiB of JSON")
+
+        parquet_path = os.path.join(tmp, "employees.parquet")
+        runs = {
+            "read_json + json_normalize + to_parquet": lambda: pd.json_normalize(pd.read_json(json_path)["Employees"])
+            .to_parquet(os.path.join(tmp, "employees_notebook.parquet")),
+            "json_to_parquet (array)": lambda: json_to_parquet(json_path, parquet_path, batch_size=20_000),
+            "json_to_parquet (JSON lines)": lambda: json_to_parquet(jsonl_path, os.path.join(tmp, "employees_lines.parquet"),
+                                                                    batch_size=20_000),
+        }
+        results = {}
+        for name, run in runs.items():
+            # Timed on its own, then again under tracemalloc (which slows allocation down) for the peak
+            tic = time.perf_counter()
+            run()
+            run_time = time.perf_counter() - tic
+            tracemalloc.start()
+            run()
+            results[name] = (run_time, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+        employees_df = pd.read_parquet(os.path.join(tmp, "employees_notebook.parquet"))
+        streamed_df = pd.read_parquet(parquet_path)
+        pd.testing.assert_frame_equal(streamed_df, employees_df[streamed_df.columns], check_dtype=False)
+        pd.testing.assert_frame_equal(streamed_df, pd.read_parquet(os.path.join(tmp, "employees_lines.parquet")))
+    for name, (run_time, peak) in results.items():
+        print(f"{name:<40} {run_time:.2f}s, peak {peak / 2**20:.0f} MiB")
@@ -77,6 +77,18 @@ pima_df[questionable_columns] = pima_df[questionable_columns].replace(0, np.nan)
 
 # See the caveats in the documentation: https://pandas.pydata.org/pandas-docs/stable/user_guide/indexing.html#returning-a-view-versus-a-copy
 
+# %%
+# sentinel_loading.py avoids the counting loop and the extra .replace pass: the 0s of the questionable
+# columns are handed to read_csv as na_values for those columns only, so they are parsed straight to NaN,
+# and the counts come back with the frame. They are NaN counts, so a field left blank in the file would be
+# counted too (this file has none). The same works for the "?" in imports-85.data
+from sentinel_loading import AUTO_SENTINELS, PIMA_SENTINELS, read_csv_with_sentinels
+
+pima_df, zero_counts = read_csv_with_sentinels("datasets_228_482_diabetes.csv", PIMA_SENTINELS)
+auto_df, question_mark_counts = read_csv_with_sentinels("imports-85.data", AUTO_SENTINELS, header=None, names=names)
+print(zero_counts)
+print(question_mark_counts)
+
 # %%
 print(pima_df.info())
 
@@ -96,6 +108,15 @@ auto_df_null
 ## Using one line only, work out the total percentage of missing values from the pima dataframe
 pima_df.isnull().mean()*100
 
+# %%
+# missingness_profile.py gets the counts, percentages, the length of the gaps and which columns go
+# missing together in one pass, a chunk at a time (so it works on CSVs bigger than memory too),
+# and gives back a small report that can be saved as JSON - no plotting libraries needed
+from missingness_profile import profile_missingness
+
+auto_missing_report = profile_missingness("imports-85.data", header=None, names=names, na_values="?")
+{col: stats for col, stats in auto_missing_report["columns"].items() if stats["missing"]}
+
 # %% [markdown]
 # Visualising missing Data
 # There is a very useful package called missingno which allows us to easily visualise our 
@@ -255,6 +276,17 @@ pima_rf_df = pd.DataFrame(data=pima_rf_arr, columns=pima_cols)
 fig_rf = px.scatter(pima_rf_df, x="SkinThickness", y="BMI", title="SkinThickness vs BMI (RandomForest Imputation)", color=nulls)
 fig_rf
 
+# %%
+# IterativeImputer fits a new 100-tree forest for every column in each of its 10 rounds.
+# forest_imputation.ForestImputer fits the columns in parallel, only refits a quarter of each
+# forest per round and stops once the imputations stop converging - several times faster here
+from forest_imputation import ForestImputer
+
+forest_impute = ForestImputer(random_state=42, time_budget=60)
+pima_forest_df = forest_impute.fit_transform(pima_df)
+print("Rounds:", forest_impute.n_iter_)
+pima_forest_df
+
 # %%
 fig = make_subplots(rows=1, cols=3, shared_xaxes=False, subplot_titles=("KNN Imputation", "BR Regression Imputation", "RF Regression Imputation"))
 fig.add_trace(fig_knn['data'][0], row=1, col=1)
@@ -262,6 +294,14 @@ fig.add_trace(fig_br['data'][0], row=1, col=2)
 fig.add_trace(fig_rf['data'][0], row=1, col=3)
 fig.update_layout(title="SkinThickness vs BMI (Regression Imputations)")
 fig.show()
+# %%
+# The plots show how the imputations look, not how right they are. imputation_benchmark.py hides 10% of
+# the values we do know, lets every imputer above fill them in (in parallel) and measures the error
+# against the real values, the time taken and the peak memory of each
+from imputation_benchmark import run_benchmark
+
+imputer_scores = run_benchmark(pima_df, fraction=0.1, repeats=2)
+imputer_scores
 # %% [markdown]
 # Time Series Imputation
 # Time series data referes to data that has been collected over time, with each datapoint being indexed by a sequential datetime. 
@@ -332,6 +372,15 @@ pm_nearest_df["wind_speed"][31230:31245]
 # Apply the quadratic strategy now
 pm_quad_df = pm_df.interpolate(method="quadratic")
 pm_quad_df["wind_speed"][31230:31245]
+# %%
+# When new readings keep arriving, stream_interpolation.py fills each batch as it comes in from a
+# little state kept per column, instead of interpolating the whole history again.
+# max_gap=24 leaves gaps of more than a day empty rather than drawing a straight line across them
+from stream_interpolation import interpolate_stream
+
+pm_batches = (pm_df.iloc[i:i + 1000] for i in range(0, len(pm_df), 1000))
+pm_stream_df = pd.concat(interpolate_stream(pm_batches, method="linear", max_gap=24))
+pm_stream_df["wind_speed"][31230:31245]
 # %% [markdown]
 ### Visualising Time-series data
 
@@ -401,6 +450,26 @@ knn_pm_arr = knn_impute.fit_transform(pm_to_impute_df)
 knn_pm_df = pd.DataFrame(knn_pm_arr, columns = pm_to_impute_cols)
 knn_pm_df[31230:31245]
 # %%
+# KNNImputer compares every row that has a gap with every other row. knn_imputation.py takes the
+# neighbours from the complete rows through a KD-tree instead and imputes the rows in batches,
+# which keeps the memory use small and can use several processes
+# (imported as tree_knn_impute so the knn_impute KNNImputer above isn't overwritten)
+from knn_imputation import knn_impute as tree_knn_impute
+
+knn_tree_pm_df, knn_report = tree_knn_impute(pm_to_impute_df, n_neighbors=3, weights="distance",
+                                             processes=4, return_report=True)
+print(knn_report)
+knn_tree_pm_df[31230:31245]
+# %%
+# For time series the relevant neighbours are the readings close in time. windowed_knn_impute
+# only searches the complete rows within +/- 48 hours of each gap (found by binary search on
+# the sorted Date index), so the seasons don't get mixed up and it is much faster
+from knn_imputation import windowed_knn_impute
+
+knn_window_pm_df = windowed_knn_impute(pm_to_impute_df, window="48h", n_neighbors=3, weights="distance",
+                                       processes=4)
+knn_window_pm_df[31230:31245]
+# %%
 for col in cat_cols:
     knn_pm_df[col] = knn_pm_df[col].round()
 knn_pm_df.index = pm_df.index
@@ -418,6 +487,19 @@ pm_imputed_df = pm_df.copy(deep=True)
 pm_imputed_df.update(knn_pm_df, overwrite=False)
 pm_imputed_df[31230:31245]
 # %%
+# category_codec.py does the same encode / decode without the dictionaries and .replace: the
+# categorical columns become their pd.Categorical codes (NaN where missing), and after imputation
+# the float codes are rounded and turned back into categories by position. The categories are
+# saved so that new data can be encoded the same way later
+from category_codec import CategoryCodec
+from knn_imputation import knn_impute as tree_knn_impute
+
+codec = CategoryCodec(cat_cols).fit(pm_df)
+pm_encoded_df = codec.encode(pm_df[pm_to_impute_cols])
+pm_knn_decoded_df = codec.decode(tree_knn_impute(pm_encoded_df, n_neighbors=3, weights="distance"))
+codec.save("pm_categories.json")
+pm_knn_decoded_df[31230:31245]
+# %%
 nulls = pm_df["wind_speed"][31230:31245].isnull()
 print(nulls)
 
@@ -0,0 +1,180 @@
+# %%
+# Local cache for datasets read from a URL with pd.read_csv.
+# The notebooks call pd.read_csv('https://aicore-files.s3.amazonaws.com/.../Salaries.csv')
+# several times per run, downloading and parsing the same file every time.
+# RemoteCSVCache keeps:
+#   - the downloaded bytes, stored under the SHA-256 of their content (blobs/)
+#   - the parsed DataFrame in Parquet (or pickle if pyarrow is not installed) (frames/)
+#   - per-URL metadata (ETag, Last-Modified, when it was last checked) (urls/)
+#   - the parsed frames of this session in memory
+# Within the TTL a URL is served without touching the network. After that a
+# conditional GET is sent and a "304 Not Modified" reuses what is on disk.
+import hashlib
+import io
+import json
+import os
+import time
+import warnings
+from pathlib import Path
+
+import pandas as pd
+import requests
+
+try:
+    import pyarrow  # noqa: F401
+    FRAME_FORMAT = "parquet"
+except ImportError:
+    FRAME_FORMAT = "pickle"
+
+CACHE_DIR = Path(os.environ.get("DATASET_CACHE_DIR", Path.home() / ".cache" / "aicore_datasets"))
+DEFAULT_TTL = 60 * 60  # seconds
+
+
+class RemoteCSVCache:
+    """Cache the CSV files behind URLs on disk and in memory.
+
+    ttl is the number of seconds a URL is trusted without asking the server
+    again (0 to always revalidate). session can be any object with a
+    requests-style get() method.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=DEFAULT_TTL, session=None, timeout=30):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self._frames = {}
+        for sub in ("blobs", "frames", "urls"):
+            (self.cache_dir / sub).mkdir(parents=True, exist_ok=True)
+
+    def read_csv(self, url, **read_csv_kwargs):
+        """Return pd.read_csv(url, **read_csv_kwargs), using the cache where possible.
+
+        The result is a copy, so callers can modify it without changing the cache.
+        """
+        content_hash = self._content_hash(url)
+        frame_key = f"{content_hash}-{_hash_text(repr(sorted(read_csv_kwargs.items())))}"
+
+        if frame_key not in self._frames:
+            frame_path = self.cache_dir / "frames" / f"{frame_key}.{FRAME_FORMAT}"
+            if frame_path.exists():
+                df = _read_frame(frame_path)
+            else:
+                blob = (self.cache_dir / "blobs" / content_hash).read_bytes()
+                df = pd.read_csv(io.BytesIO(blob), **read_csv_kwargs)
+                _write_frame(df, frame_path)
+            self._frames[frame_key] = df
+        return self._frames[frame_key].copy()
+
+    def clear(self, memory_only=False):
+        """Forget everything that is cached (only the in-memory frames if memory_only)."""
+        self._frames.clear()
+        if memory_only:
+            return
+        for sub in ("blobs", "frames", "urls"):
+            for path in (self.cache_dir / sub).iterdir():
+                path.unlink()
+
+    def _content_hash(self, url):
+        # Return the content hash of the current version of url, downloading it if needed
+        meta_path = self.cache_dir / "urls" / f"{_hash_text(url)}.json"
+        meta = json.loads(meta_path.read_text()) if meta_path.exists() else None
+        if meta is not None and not (self.cache_dir / "blobs" / meta["content_hash"]).exists():
+            meta = None
+
+        if meta is not None and time.time() - meta["checked_at"] < self.ttl:
+            return meta["content_hash"]
+
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            if meta is None:
+                raise
+            warnings.warn(f"Could not revalidate {url} ({e}), using the cached copy")
+            return meta["content_hash"]
+
+        if response.status_code == 304 and meta is not None:
+            meta["checked_at"] = time.time()
+        else:
+            response.raise_for_status()
+            content_hash = hashlib.sha256(response.content).hexdigest()
+            blob_path = self.cache_dir / "blobs" / content_hash
+            if not blob_path.exists():
+                _atomic_write(blob_path, response.content)
+            meta = {
+                "url": url,
+                "content_hash": content_hash,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "checked_at": time.time(),
+            }
+        _atomic_write(meta_path, json.dumps(meta).encode())
+        return meta["content_hash"]
+
+
+_default_cache = None
+
+
+def read_csv_cached(url, **read_csv_kwargs):
+    """pd.read_csv for URLs, going through a shared RemoteCSVCache."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = RemoteCSVCache()
+    return _default_cache.read_csv(url, **read_csv_kwargs)
+
+
+def _hash_text(text):
+    return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+
+def _read_frame(path):
+    if FRAME_FORMAT == "parquet":
+        return pd.read_parquet(path)
+    return pd.read_pickle(path)
+
+
+def _write_frame(df, path):
+    buffer = io.BytesIO()
+    if FRAME_FORMAT == "parquet":
+        df.to_parquet(buffer)
+    else:
+        df.to_pickle(buffer)
+    _atomic_write(path, buffer.getvalue())
+
+
+def _atomic_write(path, data):
+    # Write to a temporary file first so a crash never leaves half a file in the cache
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+# %%
+if __name__ == "__main__":
+    # Serve the local copy of the data over HTTP so the cache can be tried out offline
+    import tempfile
+    import threading
+    from functools import partial
+    from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+    handler = partial(SimpleHTTPRequestHandler, directory=os.path.dirname(os.path.abspath(__file__)))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/Salaries.csv"
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = RemoteCSVCache(cache_dir, ttl=0)
+        for label in ["download", "memory", "revalidated (304)"]:
+            if label.startswith("revalidated"):
+                cache.clear(memory_only=True)
+            tic = time.perf_counter()
+            sf_sal = cache.read_csv(url, index_col="Id")
+            print(f"{label:>18}: {time.perf_counter() - tic:.4f}s, shape {sf_sal.shape}")
+    server.shutdown()
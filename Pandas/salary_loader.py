@@ -0,0 +1,107 @@
+# %%
+# Typed loader for the San Francisco salaries dataset (data.csv / Salaries.csv).
+# With the default read_csv dtypes every text column is a Python-object column
+# and every pay column is float64. Most of the text columns only hold a few
+# distinct values (JobTitle, Agency, Status...), so storing them as category is
+# much smaller, the pay columns fit in float32 to within a few cents, and Year
+# fits in int16.
+import numpy as np
+import pandas as pd
+
+# Declared schema: column -> dtype used when loading
+SALARY_SCHEMA = {
+    "EmployeeName": "category",
+    "JobTitle": "category",
+    "BasePay": "float32",
+    "OvertimePay": "float32",
+    "OtherPay": "float32",
+    "Benefits": "float32",
+    "TotalPay": "float32",
+    "TotalPayBenefits": "float32",
+    "Year": "int16",
+    "Notes": "category",
+    "Agency": "category",
+    "Status": "category",
+}
+
+# float32 is only used for a pay column if no value moves by more than this (in dollars)
+FLOAT32_TOLERANCE = 0.05
+# A category column is kept as plain text if more than this fraction of its values are distinct
+MAX_CATEGORY_RATIO = 0.5
+
+
+def load_salaries(path="data.csv", index_col="Id", schema=SALARY_SCHEMA, float_tolerance=FLOAT32_TOLERANCE,
+                  max_category_ratio=MAX_CATEGORY_RATIO, **read_csv_kwargs):
+    """Read the salaries CSV (a local path or URL) using the declared schema.
+
+    Text columns are parsed straight into categories by read_csv. Numeric
+    columns are read as usual and then downcast one at a time, falling back
+    to a wider type if the narrow one would lose information:
+      - float32 columns stay float64 if any value changes by more than float_tolerance
+      - int16 columns use the nullable Int16 if there are missing values, and stay
+        int64 if the values are out of range
+      - category columns go back to the default text dtype if they are mostly
+        unique values (EmployeeName, for example)
+    """
+    categories = {col: dtype for col, dtype in schema.items() if dtype == "category"}
+    df = pd.read_csv(path, index_col=index_col, dtype=categories, **read_csv_kwargs)
+
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            continue
+        if dtype == "category":
+            if len(df) and df[col].cat.categories.size > max_category_ratio * len(df):
+                df[col] = df[col].astype(df[col].cat.categories.dtype)
+        elif dtype.startswith("float"):
+            df[col] = _downcast_float(df[col], dtype, float_tolerance)
+        elif dtype.startswith("int"):
+            df[col] = _downcast_int(df[col], dtype)
+    return df
+
+
+def memory_report(before, after):
+    """Compare memory_usage(deep=True) of two versions of the same frame.
+
+    Returns a DataFrame with the bytes used per column before and after,
+    the dtypes, and a "Total" row.
+    """
+    report = pd.DataFrame({
+        "dtype_before": before.dtypes.astype(str),
+        "dtype_after": after.dtypes.astype(str),
+        "bytes_before": before.memory_usage(deep=True, index=False),
+        "bytes_after": after.memory_usage(deep=True, index=False),
+    })
+    report.loc["Total"] = ["", "", before.memory_usage(deep=True).sum(), after.memory_usage(deep=True).sum()]
+    report["saving_%"] = (100 * (1 - report["bytes_after"] / report["bytes_before"])).round(1)
+    return report
+
+
+def compare_memory(path="data.csv", index_col="Id", **kwargs):
+    """Load path with the default dtypes and with load_salaries and report the difference."""
+    before = pd.read_csv(path, index_col=index_col)
+    after = load_salaries(path, index_col=index_col, **kwargs)
+    return memory_report(before, after)
+
+
+def _downcast_float(series, dtype, tolerance):
+    narrow = series.astype(dtype)
+    error = np.abs(narrow.astype("float64") - series)
+    if error.max(skipna=True) > tolerance:
+        return series
+    return narrow
+
+
+def _downcast_int(series, dtype):
+    info = np.iinfo(dtype)
+    if series.min() < info.min or series.max() > info.max:
+        return series
+    if series.isna().any():
+        return series.astype(dtype.capitalize())
+    return series.astype(dtype)
+
+
+# %%
+if __name__ == "__main__":
+    sf_sal = load_salaries("data.csv")
+    sf_sal.info(memory_usage="deep")
+    print(compare_memory("data.csv"))